@@ -3,16 +3,15 @@ from logger import logger
 class DataProcessor:
     def process_data(self, data_frame, selected_columns, aggregation_method):
         try:
-            # Обработка данных с помощью выбранного метода агрегации
-            if aggregation_method == 'mean':
-                processed_data = data_frame[selected_columns].mean().to_frame().T
-            elif aggregation_method == 'median':
-                processed_data = data_frame[selected_columns].median().to_frame().T
-            elif aggregation_method == 'sum':
-                processed_data = data_frame[selected_columns].sum().to_frame().T
-            else:
+            # Один метод или список методов; все считаются одним вызовом agg
+            methods = [aggregation_method] if isinstance(aggregation_method, str) else list(aggregation_method)
+            if not methods or any(method not in ('mean', 'median', 'sum') for method in methods):
                 raise ValueError("Неподдерживаемый метод агрегации")
-            
+
+            processed_data = data_frame[selected_columns].agg(methods)
+            if isinstance(aggregation_method, str):
+                processed_data = processed_data.reset_index(drop=True)
+
             return processed_data
         except Exception as e:
             logger.error(f"Ошибка при обработке данных: {str(e)}")
@@ -27,10 +26,10 @@ class DataProcessor:
             logger.error(f"Ошибка при фильтрации данных: {str(e)}")
             raise
 
-    def group_data(self, data_frame, group_by_column, selected_columns):
+    def group_data(self, data_frame, group_by_column, selected_columns, aggregation_method='mean'):
         try:
-            # Группируем данные и вычисляем среднее для каждой функции
-            grouped_data = data_frame.groupby(group_by_column)[selected_columns].mean().reset_index()
+            # Группируем данные и вычисляем выбранные статистики (по умолчанию среднее) за одну группировку
+            grouped_data = data_frame.groupby(group_by_column)[selected_columns].agg(aggregation_method).reset_index()
             return grouped_data
         except Exception as e:
             logger.error(f"Ошибка при группировке данных: {str(e)}")
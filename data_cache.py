@@ -0,0 +1,203 @@
+import os
+import re
+import shutil
+import hashlib
+import pandas as pd
+from logger import logger
+
+try:
+    import pyarrow  # noqa: F401  (нужен pandas для формата Feather)
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+class DataCache:
+    """
+    Бинарный колоночный кэш загруженных таблиц.
+
+    Копия таблицы хранится в папке .grapher_cache рядом с исходным файлом.
+    Ключ строится из пути, размера, времени изменения и хэша содержимого,
+    поэтому при изменении исходника старая копия просто перестает совпадать.
+    """
+    CACHE_DIR_NAME = '.grapher_cache'
+    HASH_BLOCK_SIZE = 1 << 20  # 1 МБ с начала, середины и конца файла
+
+    STORE_SUFFIX = '.store'
+
+    def __init__(self, max_cache_bytes=2 * 1024 ** 3, enabled=True, max_store_bytes=64 * 1024 ** 3):
+        """
+        :param max_cache_bytes: Лимит для бинарных копий таблиц (.feather/.pkl).
+        :param max_store_bytes: Отдельный лимит для хранилищ .store (колонки .npy для
+                                таблиц больше памяти); None — без ограничения.
+        """
+        self.max_cache_bytes = max_cache_bytes
+        self.max_store_bytes = max_store_bytes
+        self.enabled = enabled
+        self.extension = '.feather' if HAS_PYARROW else '.pkl'
+
+    def load(self, file_path, variant='', columns=None):
+        """
+        Возвращает закэшированную таблицу или None, если копии нет или она устарела.
+
+        :param file_path: Путь к исходному файлу.
+        :param variant: Параметры загрузки (лист, типы), влияющие на результат.
+        :param columns: Прочитать только эти колонки (Feather читает их без остальных).
+        """
+        if not self.enabled:
+            return None
+        try:
+            cache_path = self._cache_path(file_path, variant)
+            if not os.path.exists(cache_path):
+                return None
+
+            if HAS_PYARROW:
+                data_frame = pd.read_feather(cache_path, columns=list(columns) if columns is not None else None)
+            else:
+                data_frame = pd.read_pickle(cache_path)
+                if columns is not None:
+                    data_frame = data_frame[list(columns)]
+
+            # Обновляем время доступа для вытеснения по давности использования
+            os.utime(cache_path)
+            logger.info(f"Данные загружены из кэша: {cache_path}")
+            return data_frame
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать кэш для {file_path}: {str(e)}")
+            return None
+
+    def store(self, file_path, data_frame, variant=''):
+        """Сохраняет бинарную копию таблицы и удаляет устаревшие копии этого файла."""
+        if not self.enabled:
+            return
+        try:
+            key = self._source_key(file_path)
+            cache_path = self._cache_path(file_path, variant, key)
+            cache_dir = os.path.dirname(cache_path)
+            os.makedirs(cache_dir, exist_ok=True)
+            # Копии с другим ключом относятся к прежней версии исходника
+            self._remove_stale(cache_dir, file_path, key)
+
+            tmp_path = cache_path + '.tmp'
+            if HAS_PYARROW:
+                data_frame.reset_index(drop=True).to_feather(tmp_path)
+            else:
+                data_frame.to_pickle(tmp_path)
+            os.replace(tmp_path, cache_path)
+            logger.info(f"Создан кэш: {cache_path}")
+
+            self.evict(cache_dir, keep=cache_path)
+        except Exception as e:
+            # Кэш — только ускорение, ошибки записи не должны мешать загрузке
+            logger.warning(f"Не удалось сохранить кэш для {file_path}: {str(e)}")
+
+    def store_dir(self, file_path, variant=''):
+        """
+        Возвращает папку для хранилища в виде отдельных файлов (например, .npy на колонку).
+
+        :return: (путь к папке, признак того, что хранилище уже создано для текущей версии файла)
+        """
+        key = self._source_key(file_path)
+        dir_path = os.path.join(self._cache_dir(file_path), f"{self._entry_prefix(file_path, variant)}{key}{self.STORE_SUFFIX}")
+        if os.path.isdir(dir_path):
+            os.utime(dir_path)
+            return dir_path, True
+
+        os.makedirs(self._cache_dir(file_path), exist_ok=True)
+        self._remove_stale(self._cache_dir(file_path), file_path, key)
+        return dir_path, False
+
+    def evict(self, cache_dir, keep=None):
+        """
+        Удаляет самые давно использованные копии, пока папка не уложится в лимиты.
+
+        Копии таблиц и хранилища .store вытесняются независимо, каждые по своему лимиту.
+
+        :param keep: Только что созданная запись, которую вытеснять нельзя.
+        """
+        copies = []
+        stores = []
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            if name.endswith('.tmp') or (keep is not None and os.path.abspath(path) == os.path.abspath(keep)):
+                # Незавершенные записи и защищенная запись в подсчет не входят
+                continue
+            stat = os.stat(path)
+            entry = (stat.st_mtime, self._entry_size(path), path)
+            (stores if name.endswith(self.STORE_SUFFIX) else copies).append(entry)
+
+        keep_size = self._entry_size(keep) if keep is not None and os.path.exists(keep) else 0
+        is_store = keep is not None and keep.endswith(self.STORE_SUFFIX)
+        self._evict_entries(copies, self.max_cache_bytes, 0 if is_store else keep_size)
+        self._evict_entries(stores, self.max_store_bytes, keep_size if is_store else 0)
+
+    def _evict_entries(self, entries, max_bytes, reserved):
+        if max_bytes is None:
+            return
+        total_size = reserved + sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= max_bytes:
+                break
+            self._remove_entry(path)
+            total_size -= size
+            logger.info(f"Кэш вытеснен: {path}")
+
+    def clear(self, file_path):
+        """Удаляет все копии для указанного файла."""
+        cache_dir = self._cache_dir(file_path)
+        if os.path.isdir(cache_dir):
+            self._remove_stale(cache_dir, file_path, None)
+
+    def _cache_dir(self, file_path):
+        return os.path.join(os.path.dirname(os.path.abspath(file_path)), self.CACHE_DIR_NAME)
+
+    def _entry_prefix(self, file_path, variant):
+        variant_key = hashlib.blake2b(variant.encode('utf-8'), digest_size=4).hexdigest()
+        return f"{os.path.basename(file_path)}-{variant_key}-"
+
+    def _cache_path(self, file_path, variant, key=None):
+        key = key or self._source_key(file_path)
+        name = f"{self._entry_prefix(file_path, variant)}{key}{self.extension}"
+        return os.path.join(self._cache_dir(file_path), name)
+
+    def _source_key(self, file_path):
+        """Ключ: путь, размер, mtime и хэш фрагментов содержимого."""
+        abs_path = os.path.abspath(file_path)
+        stat = os.stat(abs_path)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{abs_path}|{stat.st_size}|{stat.st_mtime_ns}".encode('utf-8'))
+
+        # Полный хэш многогигабайтного файла стоит столько же, сколько его разбор,
+        # поэтому хэшируем начало, середину и конец
+        with open(abs_path, 'rb') as f:
+            for offset in (0, stat.st_size // 2, max(stat.st_size - self.HASH_BLOCK_SIZE, 0)):
+                f.seek(offset)
+                digest.update(f.read(self.HASH_BLOCK_SIZE))
+        return digest.hexdigest()
+
+    def _remove_stale(self, cache_dir, file_path, keep_key):
+        """
+        Удаляет копии указанного файла, кроме копий с ключом keep_key.
+
+        Имя копии разбирается целиком (<имя файла>-<вариант>-<ключ><расширение>), а не по префиксу:
+        иначе копии 'run.csv-old.csv' считались бы копиями 'run.csv'.
+        """
+        pattern = re.compile(re.escape(os.path.basename(file_path)) +
+                             r'-[0-9a-f]{8}-(?P<key>[0-9a-f]{32})(?:\.feather|\.pkl|\.store)(?:\.tmp)?')
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            match = pattern.fullmatch(name)
+            if match and (keep_key is None or match.group('key') != keep_key):
+                self._remove_entry(path)
+                logger.info(f"Удален устаревший кэш: {path}")
+
+    def _entry_size(self, path):
+        if os.path.isdir(path):
+            return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+        return os.path.getsize(path)
+
+    def _remove_entry(self, path):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
@@ -0,0 +1,216 @@
+import copy
+import numpy as np
+import pandas as pd
+from logger import logger
+
+
+def _frame_bytes(df) -> int:
+    """Объем таблицы без обхода строковых объектов (оценка для лимита истории)."""
+    if isinstance(df, pd.DataFrame):
+        return int(df.memory_usage(index=True, deep=False).sum())
+    if isinstance(df, pd.Series):
+        return int(df.memory_usage(index=True, deep=False))
+    return 0
+
+
+def _same_values(target: np.ndarray, source: np.ndarray) -> bool:
+    """Совпадают ли значения двух колонок (NaN равны NaN)."""
+    if target.dtype != source.dtype or target.shape != source.shape:
+        return False
+    if target.dtype.kind in 'biufcmM':
+        if target.__array_interface__['data'] == source.__array_interface__['data'] \
+                and target.strides == source.strides:
+            # Один и тот же буфер — сравнивать нечего
+            return True
+        return bool(np.array_equal(target, source, equal_nan=target.dtype.kind in 'fcmM'))
+    return pd.Series(target).equals(pd.Series(source))
+
+
+class FrameDelta:
+    """
+    Разница между двумя таблицами: как получить target из source.
+
+    Хранятся только колонки target, которые отличаются от source (ссылки на уже
+    существующие массивы, без копирования), перестановка строк и строки, удаленные
+    фильтром. Если таблицы не связаны по строкам (например, после агрегации),
+    хранится ссылка на target целиком.
+    """
+
+    def __init__(self, columns=None, stored=None, positions=None, removed=None, order=None, snapshot=None,
+                 attrs=None):
+        self.columns = columns        # Порядок колонок target
+        self.stored = stored or {}    # Измененные колонки target: {имя: Series}
+        self.positions = positions    # Номера строк source для строк target (None — те же строки)
+        self.removed = removed        # Строки target, которых нет в source
+        self.order = order            # Порядок строк после объединения оставшихся и удаленных
+        self.snapshot = snapshot      # target целиком, если разницу не построить
+        # Метаданные target (признаки сортировки, квантования): без них восстановленная
+        # таблица унаследовала бы attrs той таблицы, из которой ее собирают
+        self.attrs = copy.deepcopy(attrs if attrs is not None else getattr(snapshot, 'attrs', {}))
+
+    @classmethod
+    def from_frames(cls, target, source):
+        if not isinstance(target, pd.DataFrame) or not isinstance(source, pd.DataFrame) \
+                or not target.index.is_unique or not source.index.is_unique \
+                or not target.columns.is_unique or not source.columns.is_unique:
+            return cls(snapshot=target)
+
+        positions = source.index.get_indexer(target.index)
+        kept = positions >= 0
+        if not kept.any():
+            return cls(snapshot=target)
+        all_kept = bool(kept.all())
+        kept_positions = positions[kept] if not all_kept else positions
+        identity = all_kept and len(source) == len(target) \
+            and np.array_equal(kept_positions, np.arange(len(source)))
+
+        stored = {}
+        for col in target.columns:
+            if col in source.columns:
+                target_values = target[col].to_numpy()
+                source_values = source[col].to_numpy()
+                if not all_kept:
+                    target_values = target_values[kept]
+                if not identity:
+                    source_values = source_values[kept_positions]
+                if _same_values(target_values, source_values):
+                    continue
+            stored[col] = target[col]
+        if len(stored) == len(target.columns):
+            # Общих колонок нет — хранить разницу дороже, чем саму таблицу
+            return cls(snapshot=target)
+
+        removed = None
+        order = None
+        if not all_kept:
+            removed = target.loc[~kept, [col for col in target.columns if col not in stored]]
+            # Строка target -> номер в объединении [оставшиеся строки, удаленные строки]
+            order = np.empty(len(target), dtype=np.intp)
+            order[kept] = np.arange(int(kept.sum()))
+            order[~kept] = int(kept.sum()) + np.arange(len(removed))
+
+        return cls(list(target.columns), stored, None if identity else kept_positions, removed, order,
+                   attrs=target.attrs)
+
+    def apply(self, source: pd.DataFrame):
+        """Восстанавливает target из source."""
+        if self.snapshot is not None:
+            if isinstance(self.snapshot, pd.DataFrame):
+                self.snapshot.attrs = copy.deepcopy(self.attrs)
+            return self.snapshot
+        reused = [col for col in self.columns if col not in self.stored]
+        frame = source[reused]
+        if self.positions is not None:
+            frame = frame.take(self.positions)
+        if self.removed is not None:
+            frame = pd.concat([frame, self.removed]).take(self.order)
+        else:
+            frame = frame.copy(deep=False)
+        for col, values in self.stored.items():
+            frame[col] = values.array
+        frame = frame[self.columns]
+        frame.attrs = copy.deepcopy(self.attrs)
+        return frame
+
+    @property
+    def nbytes(self) -> int:
+        if self.snapshot is not None:
+            return _frame_bytes(self.snapshot)
+        size = sum(_frame_bytes(values) for values in self.stored.values())
+        size += _frame_bytes(self.removed)
+        for array in (self.positions, self.order):
+            size += array.nbytes if array is not None else 0
+        return size
+
+
+class HistoryEntry:
+    """Одна операция в истории: описание, разница таблиц и состояние интерфейса."""
+
+    def __init__(self, description, delta, state=None):
+        self.description = description
+        self.delta = delta
+        self.state = state or {}
+
+
+class DataHistory:
+    """
+    История изменений таблицы для отмены и повтора операций.
+
+    Каждая запись хранит только то, чем таблица до операции отличается от таблицы
+    после нее (FrameDelta), поэтому длинная сессия обработки не удваивает память.
+    Самые старые записи удаляются при превышении max_bytes.
+    """
+
+    def __init__(self, max_bytes=1024 ** 3):
+        self.max_bytes = max_bytes
+        self._undo = []
+        self._redo = []
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    @property
+    def undo_description(self):
+        return self._undo[-1].description if self._undo else None
+
+    @property
+    def redo_description(self):
+        return self._redo[-1].description if self._redo else None
+
+    @property
+    def nbytes(self) -> int:
+        return sum(entry.delta.nbytes for entry in self._undo + self._redo)
+
+    def record(self, old, new, description, state=None):
+        """
+        Запоминает операцию old -> new. Ветка повтора сбрасывается.
+
+        :param state: Произвольное состояние для восстановления вместе с таблицей.
+        """
+        if old is None:
+            return
+        self._undo.append(HistoryEntry(description, FrameDelta.from_frames(old, new), state))
+        self._redo.clear()
+        self._enforce_limit()
+
+    def undo(self, current):
+        """Возвращает (таблица до последней операции, запись истории)."""
+        if not self._undo:
+            raise ValueError("Нет операций для отмены")
+        entry = self._undo.pop()
+        previous = entry.delta.apply(current)
+        entry.delta = FrameDelta.from_frames(current, previous)
+        self._redo.append(entry)
+        logger.info(f"Отменено: {entry.description}")
+        return previous, entry
+
+    def redo(self, current):
+        """Возвращает (таблица после отмененной операции, запись истории)."""
+        if not self._redo:
+            raise ValueError("Нет операций для повтора")
+        entry = self._redo.pop()
+        following = entry.delta.apply(current)
+        entry.delta = FrameDelta.from_frames(current, following)
+        self._undo.append(entry)
+        self._enforce_limit()
+        logger.info(f"Повторено: {entry.description}")
+        return following, entry
+
+    def update_state(self, **state):
+        """Заменяет значения состояния во всех записях (например, после замены связанного объекта)."""
+        for entry in self._undo + self._redo:
+            entry.state.update(state)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+
+    def _enforce_limit(self):
+        while self._undo and self.nbytes > self.max_bytes:
+            entry = self._undo.pop(0)
+            logger.info(f"История переполнена, удалена запись: {entry.description}")
@@ -1,8 +1,38 @@
+import os
+import glob
+import json
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
+import numpy as np
 from logger import logger
+from data_cache import DataCache
+from lazy_frame import LazyFrame
+from time_series import SnapshotSeries, snapshot_time
 import csv
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pyarrow не установлен — используем C-парсер pandas
+    pa = None
+    pa_csv = None
+
+try:
+    import python_calamine  # noqa: F401  (движок calamine для pandas.read_excel)
+    XLSX_ENGINE = 'calamine'
+except ImportError:  # читаем потоково через openpyxl в режиме read_only
+    XLSX_ENGINE = 'openpyxl'
+
+class LoadCancelledError(Exception):
+    """Загрузка прервана пользователем (выбрасывается из progress_callback)."""
+
+
 class DataLoader:
+    def __init__(self, cache=None):
+        # Бинарный кэш рядом с исходными файлами, чтобы не разбирать текст повторно
+        self.cache = cache if cache is not None else DataCache()
+
     # def load_csv(self, file_path):
     #     """Универсальный метод загрузки CSV"""
     #     try:
@@ -16,6 +46,11 @@ class DataLoader:
     #         raise
     def load_csv(self, file_path):
         try:
+            # Повторное открытие того же файла обслуживается из кэша
+            data_frame = self.cache.load(file_path, 'csv')
+            if data_frame is not None:
+                return data_frame
+
             # Загружаем CSV в DataFrame
             data_frame = pd.read_csv(file_path)
             
@@ -23,6 +58,7 @@ class DataLoader:
             if data_frame.empty:
                 raise ValueError("Файл не содержит данных")
             
+            self.cache.store(file_path, data_frame, 'csv')
             return data_frame
         except FileNotFoundError:
             raise FileNotFoundError("Файл не найден")
@@ -33,6 +69,449 @@ class DataLoader:
         except Exception as e:
             raise Exception(f"Неизвестная ошибка при загрузке CSV: {str(e)}")
         
+    def load_csv_chunked(self, file_path, chunk_size=500_000, dtype=None, use_float32=False,
+                         progress_callback=None, sample_rows=1000):
+        """
+        Потоковая загрузка больших CSV по частям с явными типами колонок.
+
+        :param file_path: Путь к CSV файлу.
+        :param chunk_size: Количество строк в одном блоке.
+        :param dtype: Словарь {колонка: тип}; если не задан, типы определяются по первым строкам.
+        :param use_float32: Хранить числовые колонки во float32 (вдвое меньше памяти).
+        :param progress_callback: Функция progress_callback(доля от 0 до 1), вызывается после каждого блока.
+        :param sample_rows: Количество строк для определения типов.
+        :return: DataFrame с теми же колонками, что и у load_csv.
+        """
+        try:
+            cache_variant = self._chunked_cache_variant(dtype, use_float32)
+            data_frame = self.cache.load(file_path, cache_variant)
+            if data_frame is not None:
+                self._report_progress(progress_callback, 1, 1)
+                return data_frame
+
+            total_size = os.path.getsize(file_path)
+            dtype = self._resolve_csv_dtypes(file_path, dtype, use_float32, sample_rows)
+
+            if pa_csv is not None:
+                data_frame = self._read_csv_pyarrow(file_path, dtype, chunk_size, total_size, progress_callback)
+            else:
+                data_frame = self._read_csv_pandas(file_path, dtype, chunk_size, total_size, progress_callback)
+
+            if data_frame.empty:
+                raise ValueError("Файл не содержит данных")
+
+            self.cache.store(file_path, data_frame, cache_variant)
+            logger.info(f"CSV загружен по частям: {file_path}, строк: {len(data_frame)}, "
+                        f"память: {data_frame.memory_usage(deep=True).sum() / 2**20:.1f} МБ")
+            return data_frame
+        except FileNotFoundError:
+            raise FileNotFoundError("Файл не найден")
+        except pd.errors.EmptyDataError:
+            raise pd.errors.EmptyDataError("Файл пуст")
+        except pd.errors.ParserError as e:
+            raise pd.errors.ParserError(f"Ошибка парсинга: {str(e)}")
+        except (ValueError, LoadCancelledError):
+            raise
+        except Exception as e:
+            raise Exception(f"Неизвестная ошибка при загрузке CSV: {str(e)}")
+
+    def _resolve_csv_dtypes(self, file_path, dtype, use_float32, sample_rows):
+        """Определяет типы колонок по первым строкам файла."""
+        float_dtype = np.float32 if use_float32 else np.float64
+        sample = pd.read_csv(file_path, nrows=sample_rows)
+        resolved = {}
+        for col in sample.columns:
+            if dtype and col in dtype:
+                resolved[col] = dtype[col]
+            elif pd.api.types.is_numeric_dtype(sample[col]) and not pd.api.types.is_bool_dtype(sample[col]):
+                # Целые тоже приводим к float: в следующих блоках могут встретиться пропуски
+                resolved[col] = float_dtype
+            else:
+                resolved[col] = object
+        return resolved
+
+    def _read_csv_pyarrow(self, file_path, dtype, chunk_size, total_size, progress_callback):
+        """Потоковое чтение через многопоточный парсер pyarrow."""
+        column_types = {
+            col: pa.from_numpy_dtype(np.dtype(col_type))
+            for col, col_type in dtype.items() if col_type is not object
+        }
+        # Размер блока в байтах подбираем так, чтобы в нем было примерно chunk_size строк
+        with open(file_path, 'rb') as f:
+            f.readline()
+            row_size = max(len(f.readline()), 1)
+        block_size = int(min(max(chunk_size * row_size, 1 << 20), 1 << 30))
+
+        # pyarrow читает файл с опережением, поэтому прогресс оцениваем по числу строк
+        estimated_rows = max(total_size // row_size, 1)
+        rows_read = 0
+        batches = []
+        reader = pa_csv.open_csv(
+            file_path,
+            read_options=pa_csv.ReadOptions(block_size=block_size),
+            convert_options=pa_csv.ConvertOptions(column_types=column_types)
+        )
+        for batch in reader:
+            batches.append(batch)
+            rows_read += batch.num_rows
+            self._report_progress(progress_callback, min(rows_read, estimated_rows - 1), estimated_rows)
+
+        table = pa.Table.from_batches(batches, schema=reader.schema)
+        data_frame = table.to_pandas()
+        self._report_progress(progress_callback, total_size, total_size)
+        return data_frame
+
+    def _read_csv_pandas(self, file_path, dtype, chunk_size, total_size, progress_callback):
+        """Потоковое чтение C-парсером pandas."""
+        chunks = []
+        with open(file_path, 'rb') as f:
+            for chunk in pd.read_csv(f, dtype=dtype, chunksize=chunk_size, engine='c'):
+                chunks.append(chunk)
+                self._report_progress(progress_callback, f.tell(), total_size)
+
+        if not chunks:
+            return pd.DataFrame(columns=list(dtype))
+        data_frame = pd.concat(chunks, ignore_index=True)
+        self._report_progress(progress_callback, total_size, total_size)
+        return data_frame
+
+    @staticmethod
+    def _chunked_cache_variant(dtype=None, use_float32=False):
+        """Вариант кэша для load_csv_chunked (его же читает load_csv_columns)."""
+        return f"csv_chunked|float32={use_float32}|dtype={sorted((dtype or {}).items(), key=str)}"
+
+    def load_csv_memmap(self, file_path, chunk_size=500_000, use_float32=False, progress_callback=None):
+        """
+        Загрузка CSV через хранилище .npy с отображением в память.
+
+        При первом вызове каждая числовая колонка один раз записывается в отдельный .npy файл.
+        Возвращаемый DataFrame не копирует данные, а ссылается на отображенные файлы,
+        поэтому в память подгружаются только реально читаемые страницы.
+        Нечисловые колонки в хранилище не попадают.
+
+        :param file_path: Путь к CSV файлу.
+        :param chunk_size: Количество строк в блоке при первичном преобразовании.
+        :param use_float32: Хранить колонки во float32.
+        :param progress_callback: Функция progress_callback(доля от 0 до 1).
+        :return: DataFrame, колонки которого — numpy.memmap только для чтения.
+        """
+        try:
+            store_dir, ready = self.cache.store_dir(file_path, f"npy|float32={use_float32}")
+            if not ready:
+                self._build_npy_store(file_path, store_dir, chunk_size, use_float32, progress_callback)
+                self.cache.evict(os.path.dirname(store_dir), keep=store_dir)
+            else:
+                self._report_progress(progress_callback, 1, 1)
+
+            with open(os.path.join(store_dir, 'columns.json'), encoding='utf-8') as f:
+                columns = json.load(f)
+            arrays = {
+                col: np.load(os.path.join(store_dir, f"{i}.npy"), mmap_mode='r')
+                for i, col in enumerate(columns)
+            }
+            # copy=False сохраняет колонки как отдельные блоки поверх memmap
+            data_frame = pd.DataFrame(arrays, copy=False)
+            if data_frame.empty:
+                raise ValueError("Файл не содержит числовых данных")
+
+            logger.info(f"Хранилище .npy подключено: {store_dir}, строк: {len(data_frame)}")
+            return data_frame
+        except FileNotFoundError:
+            raise FileNotFoundError("Файл не найден")
+        except pd.errors.EmptyDataError:
+            raise pd.errors.EmptyDataError("Файл пуст")
+        except pd.errors.ParserError as e:
+            raise pd.errors.ParserError(f"Ошибка парсинга: {str(e)}")
+        except (ValueError, LoadCancelledError):
+            raise
+        except Exception as e:
+            raise Exception(f"Неизвестная ошибка при загрузке CSV: {str(e)}")
+
+    def _build_npy_store(self, file_path, store_dir, chunk_size, use_float32, progress_callback):
+        """Однократно раскладывает числовые колонки CSV по файлам .npy."""
+        dtype = self._resolve_csv_dtypes(file_path, None, use_float32, 1000)
+        numeric = [col for col, col_type in dtype.items() if col_type is not object]
+        skipped = [col for col in dtype if col not in numeric]
+        if skipped:
+            logger.warning(f"Нечисловые колонки не попадут в хранилище .npy: {skipped}")
+
+        tmp_dir = store_dir + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        total_size = os.path.getsize(file_path)
+
+        # Сначала дописываем блоки в сырые файлы, число строк станет известно только в конце
+        raw_files = [open(os.path.join(tmp_dir, f"{i}.raw"), 'wb') for i in range(len(numeric))]
+        n_rows = 0
+        try:
+            with open(file_path, 'rb') as f:
+                for chunk in pd.read_csv(f, dtype=dtype, usecols=numeric, chunksize=chunk_size, engine='c'):
+                    for raw, col in zip(raw_files, numeric):
+                        np.ascontiguousarray(chunk[col].to_numpy(dtype=dtype[col])).tofile(raw)
+                    n_rows += len(chunk)
+                    self._report_progress(progress_callback, f.tell(), total_size)
+        finally:
+            for raw in raw_files:
+                raw.close()
+
+        # Дописываем заголовок .npy перед сырыми данными
+        for i, col in enumerate(numeric):
+            raw_path = os.path.join(tmp_dir, f"{i}.raw")
+            header = {'descr': np.lib.format.dtype_to_descr(np.dtype(dtype[col])),
+                      'fortran_order': False, 'shape': (n_rows,)}
+            with open(os.path.join(tmp_dir, f"{i}.npy"), 'wb') as out, open(raw_path, 'rb') as raw:
+                np.lib.format.write_array_header_1_0(out, header)
+                shutil.copyfileobj(raw, out, 16 << 20)
+            os.remove(raw_path)
+
+        with open(os.path.join(tmp_dir, 'columns.json'), 'w', encoding='utf-8') as f:
+            json.dump(numeric, f, ensure_ascii=False)
+        os.replace(tmp_dir, store_dir)
+        self._report_progress(progress_callback, total_size, total_size)
+        logger.info(f"Создано хранилище .npy: {store_dir}, колонок: {len(numeric)}, строк: {n_rows}")
+
+    def _report_progress(self, progress_callback, position, total_size):
+        """Передает долю прочитанного файла в callback."""
+        if progress_callback is not None and total_size:
+            progress_callback(min(position / total_size, 1.0))
+
+    def load_data(self, file_path, file_type, progress_callback=None, lazy=False, **options):
+        """
+        Загрузка файла по его типу.
+
+        :param file_type: 'csv' или 'xlsx'.
+        :param lazy: Для CSV — читать только заголовки, колонки подгружать по требованию.
+        :param options: Параметры конкретного загрузчика (например, sheet_name и columns для XLSX).
+        """
+        if file_type == 'csv' and lazy:
+            return self.load_csv_lazy(file_path, progress_callback=progress_callback)
+        if file_type == 'csv':
+            return self.load_csv_chunked(file_path, progress_callback=progress_callback, **options)
+        if file_type == 'xlsx':
+            return self.load_xlsx(file_path, progress_callback=progress_callback, **options)
+        raise ValueError(f"Неподдерживаемый тип файла: {file_type}")
+
+    def scan_xlsx(self, file_path):
+        """
+        Быстрый просмотр структуры книги без чтения данных.
+
+        :return: Словарь {имя листа: список заголовков первой строки}.
+        """
+        from openpyxl import load_workbook
+
+        try:
+            # read_only разбирает XML листа потоково, поэтому читается только первая строка
+            workbook = load_workbook(file_path, read_only=True, data_only=True)
+            try:
+                sheets = {}
+                for sheet in workbook.worksheets:
+                    header = next(sheet.iter_rows(max_row=1, values_only=True), ())
+                    sheets[sheet.title] = [str(value) for value in header if value is not None]
+                return sheets
+            finally:
+                workbook.close()
+        except FileNotFoundError:
+            raise FileNotFoundError("Файл не найден")
+        except Exception as e:
+            raise Exception(f"Не удалось прочитать структуру XLSX: {str(e)}")
+
+    def load_xlsx(self, file_path, sheet_name=None, columns=None, progress_callback=None):
+        """
+        Загрузка одного листа XLSX.
+
+        :param sheet_name: Имя листа; по умолчанию первый лист.
+        :param columns: Список нужных колонок; по умолчанию все.
+        :param progress_callback: Функция progress_callback(доля от 0 до 1).
+        """
+        try:
+            cache_variant = f"xlsx|{sheet_name}|{columns}"
+            data_frame = self.cache.load(file_path, cache_variant)
+            if data_frame is not None:
+                self._report_progress(progress_callback, 1, 1)
+                return data_frame
+
+            if XLSX_ENGINE == 'calamine':
+                data_frame = pd.read_excel(
+                    file_path, sheet_name=sheet_name or 0, usecols=columns, engine='calamine'
+                )
+            else:
+                data_frame = self._read_xlsx_openpyxl(file_path, sheet_name, columns, progress_callback)
+            self._report_progress(progress_callback, 1, 1)
+
+            if data_frame.empty:
+                raise ValueError("Лист не содержит данных")
+
+            self.cache.store(file_path, data_frame, cache_variant)
+            logger.info(f"XLSX загружен ({XLSX_ENGINE}): {file_path}, лист: {sheet_name or 'первый'}, "
+                        f"строк: {len(data_frame)}")
+            return data_frame
+        except FileNotFoundError:
+            raise FileNotFoundError("Файл не найден")
+        except (ValueError, LoadCancelledError):
+            raise
+        except Exception as e:
+            raise Exception(f"Неизвестная ошибка при загрузке XLSX: {str(e)}")
+
+    def _read_xlsx_openpyxl(self, file_path, sheet_name, columns, progress_callback):
+        """Потоковое чтение листа значениями, без создания объектов ячеек."""
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+            rows = sheet.iter_rows(values_only=True)
+            header = [str(value) if value is not None else None for value in next(rows, ())]
+            if columns is None:
+                columns = [col for col in header if col is not None]
+            missing = [col for col in columns if col not in header]
+            if missing:
+                raise ValueError(f"Колонки не найдены на листе: {missing}")
+
+            indices = [header.index(col) for col in columns]
+            values = [[] for _ in indices]
+            total_rows = sheet.max_row or 0
+            for row_number, row in enumerate(rows, start=1):
+                for target, index in zip(values, indices):
+                    target.append(row[index] if index < len(row) else None)
+                if row_number % 10_000 == 0:
+                    self._report_progress(progress_callback, row_number, total_rows)
+        finally:
+            workbook.close()
+
+        data_frame = pd.DataFrame(dict(zip(columns, values)))
+        # Числовые колонки приводим к float, остальные оставляем как есть
+        for col in data_frame.columns:
+            converted = pd.to_numeric(data_frame[col], errors='coerce')
+            if converted.notna().sum() == data_frame[col].notna().sum():
+                data_frame[col] = converted
+        return data_frame.dropna(how='all').reset_index(drop=True)
+
+    def load_csv_lazy(self, file_path, progress_callback=None):
+        """
+        Читает только заголовки CSV и возвращает LazyFrame.
+
+        Данные колонок загружаются при первом обращении к ним (график, агрегация, спектр ТКЭ).
+        Строки подсчитываются здесь же, в потоке загрузки, чтобы len() таблицы
+        не сканировал файл в потоке интерфейса.
+        """
+        try:
+            header = pd.read_csv(file_path, nrows=0)
+            if len(header.columns) == 0:
+                raise ValueError("Файл не содержит данных")
+            n_rows = self.count_csv_rows(file_path, progress_callback)
+            logger.info(f"Прочитаны заголовки CSV: {file_path}, колонок: {len(header.columns)}, строк: {n_rows}")
+            return LazyFrame(file_path, header.columns, self, n_rows=n_rows)
+        except FileNotFoundError:
+            raise FileNotFoundError("Файл не найден")
+        except pd.errors.EmptyDataError:
+            raise pd.errors.EmptyDataError("Файл пуст")
+
+    def load_csv_columns(self, file_path, columns):
+        """
+        Читает из CSV только указанные колонки (None — все колонки).
+
+        Если файл уже загружался целиком, колонки берутся из бинарной копии в кэше.
+        """
+        cached = self.cache.load(file_path, self._chunked_cache_variant(), columns)
+        if cached is not None:
+            return cached
+        if pa_csv is not None:
+            convert_options = pa_csv.ConvertOptions(include_columns=list(columns) if columns is not None else None)
+            return pa_csv.read_csv(file_path, convert_options=convert_options).to_pandas()
+        return pd.read_csv(file_path, usecols=list(columns) if columns is not None else None, engine='c')
+
+    def count_csv_rows(self, file_path, progress_callback=None):
+        """Подсчет строк данных без разбора (по символам перевода строки)."""
+        n_lines = 0
+        last_byte = b'\n'
+        total_size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as f:
+            while block := f.read(16 << 20):
+                n_lines += block.count(b'\n')
+                last_byte = block[-1:]
+                self._report_progress(progress_callback, f.tell(), total_size)
+        if last_byte != b'\n':
+            n_lines += 1
+        return max(n_lines - 1, 0)  # без строки заголовка
+
+    def load_time_series(self, source, coordinate_columns=('X (m)', 'Y (m)', 'Z (m)'), variables=None,
+                         dtype=np.float32, max_workers=None, progress_callback=None):
+        """
+        Загрузка серии CSV-снимков одной сетки в массив (время, точка, переменная).
+
+        :param source: Папка, шаблон (например, 'run/*.csv') или список файлов.
+        :param coordinate_columns: Координатные колонки; сохраняются один раз.
+        :param variables: Переменные для загрузки; по умолчанию все числовые, кроме координат.
+        :param dtype: Тип элементов итогового массива.
+        :param max_workers: Число потоков разбора.
+        :return: SnapshotSeries. Время снимка берется из последнего числа в имени файла.
+        """
+        if isinstance(source, (list, tuple)):
+            file_paths = list(source)
+        elif os.path.isdir(source):
+            file_paths = sorted(glob.glob(os.path.join(source, '*.csv')))
+        else:
+            file_paths = sorted(glob.glob(source))
+        if not file_paths:
+            raise FileNotFoundError("Файлы снимков не найдены")
+
+        times = [snapshot_time(path, i) for i, path in enumerate(file_paths)]
+        order = np.argsort(times, kind='stable')
+        file_paths = [file_paths[i] for i in order]
+        times = [times[i] for i in order]
+
+        # Первый снимок задает сетку и список переменных
+        coordinate_columns = list(coordinate_columns)
+        first = self.load_csv_columns(file_paths[0], None if variables is None else coordinate_columns + list(variables))
+        missing = [col for col in coordinate_columns if col not in first.columns]
+        if missing:
+            raise ValueError(f"Отсутствуют координатные колонки: {', '.join(missing)}")
+        if variables is None:
+            variables = [col for col in first.columns
+                         if col not in coordinate_columns and pd.api.types.is_numeric_dtype(first[col])]
+
+        coords = first[coordinate_columns].copy()
+        reference = coords.to_numpy(dtype=np.float64)
+        data = np.empty((len(file_paths), len(coords), len(variables)), dtype=dtype)
+        data[0] = first[variables].to_numpy(dtype=dtype)
+        del first
+
+        def load_snapshot(index):
+            frame = self.load_csv_columns(file_paths[index], coordinate_columns + list(variables))
+            if len(frame) != len(reference):
+                raise ValueError(f"Снимок {file_paths[index]} имеет другое число точек")
+            values = frame[variables].to_numpy(dtype=dtype)
+            points = frame[coordinate_columns].to_numpy(dtype=np.float64)
+            if not np.array_equal(points, reference):
+                # Та же сетка, но другой порядок строк — переставляем по координатам
+                permutation = self._match_points(reference, points)
+                if permutation is None:
+                    raise ValueError(f"Снимок {file_paths[index]} записан на другой сетке")
+                values = values[permutation]
+            data[index] = values
+            return index
+
+        done = 1
+        self._report_progress(progress_callback, done, len(file_paths))
+        with ThreadPoolExecutor(max_workers=max_workers or min(len(file_paths), os.cpu_count() or 1)) as executor:
+            for _ in executor.map(load_snapshot, range(1, len(file_paths))):
+                done += 1
+                self._report_progress(progress_callback, done, len(file_paths))
+
+        logger.info(f"Загружена серия снимков: {len(file_paths)} x {len(coords)} точек x {len(variables)} переменных, "
+                    f"{data.nbytes / 2**20:.1f} МБ")
+        return SnapshotSeries(times, coords, variables, data, file_paths)
+
+    def _match_points(self, reference, points):
+        """Перестановка строк points, приводящая их к порядку reference, или None."""
+        ref_order = np.lexsort(reference.T[::-1])
+        pts_order = np.lexsort(points.T[::-1])
+        if not np.allclose(reference[ref_order], points[pts_order]):
+            return None
+        permutation = np.empty_like(ref_order)
+        permutation[ref_order] = pts_order
+        return permutation
+
     def load_theoretical_data(self, file_path):
         """Загрузка теоретических данных через общий CSV loader"""
         return self.load_csv(file_path)
\ No newline at end of file
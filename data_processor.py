@@ -1,28 +1,73 @@
 import pandas as pd
 import numpy as np
 from logger import logger
+from grid_index import GridIndex, quantize, combine_keys, split_keys
+from result_cache import ResultCache, fingerprint, make_key
 
 class DataProcessor:
-    def __init__(self):
+    # Статистики, поддерживаемые aggregate_statistics (плюс квантили через параметр quantiles)
+    SUPPORTED_STATISTICS = ('count', 'sum', 'mean', 'weighted_mean', 'std', 'min', 'max', 'median')
+    # Относительный допуск совпадения координаты со стенкой (доля размаха оси)
+    WALL_TOLERANCE = 1e-6
+    # Метаданные таблицы (DataFrame.attrs): число знаков квантованных X/Y/Z и признак сортировки
+    DECIMALS_ATTR = 'coordinate_decimals'
+    SORTED_ATTR = 'sorted_by_coordinates'
+
+    def __init__(self, result_cache: ResultCache = None):
         self.cell_sizes_calculated = False
         self.rounded_columns = []
         self.unique_values = {}
+        self.grid_index = None
+        # Результаты тяжелых операций по отпечатку входных колонок и параметрам
+        self.result_cache = result_cache or ResultCache()
+
+    def _memoize(self, operation: str, df: pd.DataFrame, input_columns, compute, **params):
+        """
+        Результат операции из кэша или вычисленный заново.
+
+        Ключ — отпечаток только тех колонок, которые читает операция, поэтому изменение
+        других колонок не сбрасывает результат. Таблицы возвращаются копией, чтобы
+        изменения вызывающего кода не портили кэш.
+        """
+        key = make_key(operation, fingerprint(df, input_columns), **params)
+        result = self.result_cache.get(key)
+        if result is None:
+            result = compute()
+            self.result_cache.put(key, result)
+        else:
+            logger.info(f"Результат '{operation}' взят из кэша")
+        return result.copy() if isinstance(result, pd.DataFrame) else result
+
+    def round_columns(self, df: pd.DataFrame, columns: list, decimals: int, quantize: bool = False) -> pd.DataFrame:
+        """
+        Округляет только выбранные колонки и сортирует по X -> Y -> Z.
 
-    def round_columns(self, df: pd.DataFrame, columns: list, decimals: int) -> pd.DataFrame:
-        """Округляет только выбранные колонки и сортирует по X -> Y -> Z."""
+        :param quantize: Округлять координаты через целочисленные ключи (quantize_columns):
+                         сортировка идет по ключам int64, а повторная сортировка
+                         уже упорядоченной таблицы пропускается.
+        """
         try:
-            # Округление только выбранных колонок
+            # Проверка колонок до изменения данных
             for col in columns:
                 if col not in df.columns:
                     raise ValueError(f"Колонка {col} не найдена")
-                df[col] = df[col].round(decimals)
-
-            # Сортировка по X/Y/Z (даже если они не округлялись)
             required_columns = ['X (m)', 'Y (m)', 'Z (m)']
             if not all(col in df.columns for col in required_columns):
                 raise ValueError("Для сортировки нужны колонки X/Y/Z (m)")
-            
+
+            if quantize:
+                df = self.quantize_columns(df, columns, decimals)
+                return self.sort_by_coordinates(df)
+
+            # Округление только выбранных колонок
+            for col in columns:
+                df[col] = df[col].round(decimals)
+            if any(col in required_columns for col in columns):
+                df.attrs.pop(self.DECIMALS_ATTR, None)
+
+            # Сортировка по X/Y/Z (даже если они не округлялись)
             df = df.sort_values(by=required_columns, ascending=[True, True, True])
+            df.attrs[self.SORTED_ATTR] = True
             logger.info(f"Данные отсортированы по {required_columns}")
             return df
 
@@ -30,38 +75,180 @@ class DataProcessor:
             logger.error(f"Ошибка при округлении: {str(e)}")
             raise
 
+    def quantize_columns(self, df: pd.DataFrame, columns: list, decimals: int) -> pd.DataFrame:
+        """
+        Округляет колонки; координаты X/Y/Z — через целочисленные ключи с шагом 10**-decimals.
+
+        Если квантованы все три координаты, число знаков запоминается в df.attrs, и дальнейшие
+        сортировка и группировка по координатам идут по ключам int64.
+        """
+        axes = list(GridIndex.AXES)
+        previous = df.attrs.get(self.DECIMALS_ATTR)
+        changed = False
+        for col in columns:
+            if col in axes:
+                df[col] = quantize(df[col].to_numpy(), decimals) / 10.0 ** decimals
+                # Округление до того же шага не меняет порядок строк
+                changed |= previous is None or previous > decimals
+            else:
+                df[col] = df[col].round(decimals)
+
+        # Частичное квантование не меняет кратность уже квантованных координат
+        if all(axis in columns for axis in axes):
+            df.attrs[self.DECIMALS_ATTR] = decimals if previous is None else min(previous, decimals)
+        if changed:
+            df.attrs.pop(self.SORTED_ATTR, None)
+        return df
+
+    def sort_by_coordinates(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Сортировка по X -> Y -> Z.
+
+        Квантованные координаты сортируются по составному ключу int64 (или np.lexsort
+        по ключам осей). Таблица с признаком сортировки в df.attrs проверяется за один
+        линейный проход и при совпадении порядка возвращается без изменений.
+        """
+        axes = list(GridIndex.AXES)
+        self.validate_columns(df, axes)
+        if df.attrs.get(self.SORTED_ATTR):
+            # pandas переносит attrs через take/sort_values/concat, поэтому признак мог
+            # остаться от таблицы с другим порядком строк
+            if self._is_sorted_by(df, axes):
+                logger.info("Данные уже отсортированы по X/Y/Z, сортировка пропущена")
+                return df
+            df.attrs.pop(self.SORTED_ATTR, None)
+
+        decimals = df.attrs.get(self.DECIMALS_ATTR)
+        if decimals is None:
+            df = df.sort_values(by=axes)
+        else:
+            keys = [quantize(df[axis].to_numpy(), decimals) for axis in axes]
+            combined = combine_keys(keys)
+            if combined is not None:
+                # Один составной ключ: быстрая нестабильная сортировка, а при совпадающих
+                # точках — стабильная, чтобы порядок дубликатов сохранялся как у sort_values
+                order = np.argsort(combined[0])
+                if (np.diff(combined[0][order]) == 0).any():
+                    order = np.argsort(combined[0], kind='stable')
+            else:
+                # lexsort сортирует по последнему ключу в первую очередь
+                order = np.lexsort(keys[::-1])
+            if not np.array_equal(order, np.arange(len(order))):
+                df = df.take(order)
+        df.attrs[self.SORTED_ATTR] = True
+        logger.info(f"Данные отсортированы по {axes}")
+        return df
+
+    def _is_sorted_by(self, df: pd.DataFrame, columns: list) -> bool:
+        """Упорядочены ли строки лексикографически по колонкам (линейная проверка без сортировки)."""
+        if len(df) < 2:
+            return True
+        ties = np.ones(len(df) - 1, dtype=bool)  # Пары соседних строк, равные по предыдущим колонкам
+        for col in columns:
+            values = df[col].to_numpy()
+            step = np.diff(values)
+            if (ties & ~(step >= 0)).any():  # NaN тоже считаются нарушением порядка
+                return False
+            ties &= step == 0
+            if not ties.any():
+                break
+        return True
+
+    def _group_sum(self, df: pd.DataFrame, values: pd.DataFrame, group_columns: list, return_codes: bool = False):
+        """
+        values.groupby(колонки df).sum() с отсортированными группами.
+
+        Квантованные координаты группируются по одному составному ключу int64
+        вместо хэширования нескольких float-колонок.
+
+        :param return_codes: Вернуть также номер строки результата для каждой строки df
+                             (-1 для строк с пропуском в ключе).
+        """
+        decimals = df.attrs.get(self.DECIMALS_ATTR)
+        if decimals is not None and all(col in GridIndex.AXES for col in group_columns):
+            combined = combine_keys([quantize(df[col].to_numpy(), decimals) for col in group_columns])
+            if combined is not None:
+                keys, lows, spans = combined
+                grouped = values.groupby(keys, sort=True)
+                sums = grouped.sum()
+                coordinates = [key / 10.0 ** decimals for key in split_keys(sums.index.to_numpy(), lows, spans)]
+                sums.index = pd.MultiIndex.from_arrays(coordinates, names=group_columns) \
+                    if len(group_columns) > 1 else pd.Index(coordinates[0], name=group_columns[0])
+                return (sums, grouped.ngroup().to_numpy()) if return_codes else sums
+        grouped = values.groupby([df[col] for col in group_columns], sort=True)
+        sums = grouped.sum()
+        return (sums, grouped.ngroup().to_numpy()) if return_codes else sums
 
-    def calculate_cell_sizes(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Рассчитывает размеры ячеек на очищенных данных."""
+    def calculate_cell_sizes(self, df: pd.DataFrame, method: str = "centers", bounds: dict = None) -> pd.DataFrame:
+        """
+        Рассчитывает размеры ячеек на очищенных данных.
+
+        :param method: 'centers' — расстояние между соседними центрами (первая ячейка после стенки
+                       получает размер второй); 'faces' — грани посередине между центрами, что
+                       корректно для неравномерных (сгущенных у стенки) сеток.
+        :param bounds: Для 'faces': координаты крайних граней по осям, например {'X (m)': (0.0, 0.1)}.
+                       Если не заданы, крайние грани отражаются симметрично относительно центра.
+        """
         try:
             # Проверка наличия колонок
             required_columns = ['X (m)', 'Y (m)', 'Z (m)']
             if not all(col in df.columns for col in required_columns):
                 raise ValueError("Отсутствуют координатные колонки X/Y/Z (m)")
-            
-            # Рассчитываем размеры для каждой оси
-            for axis in required_columns:
-                sorted_values = np.sort(df[axis].unique())
-                if len(sorted_values) < 2:
-                    raise ValueError(f"Недостаточно данных для расчета размеров по {axis}")
-                
-                # Размеры ячеек (расстояние между центрами)
-                sizes = [sorted_values[i] - sorted_values[i-1] for i in range(1, len(sorted_values))]
-                sizes = [sizes[0]] + sizes  # Первая ячейка после стенки
-                
-                # Сопоставляем размерам значения координат
-                size_col = f"size_{axis.split(' ')[0]}"
-                df[size_col] = df[axis].map(dict(zip(sorted_values, sizes)))
-            
-            # Вес ячейки = объем (size_X * size_Y * size_Z)
-            df["weight"] = df[['size_X', 'size_Y', 'size_Z']].product(axis=1)
-            logger.info("Размеры ячеек и вес рассчитаны")
+            if method not in ("centers", "faces"):
+                raise ValueError(f"Неизвестный метод расчета ячеек: {method}")
+            bounds = bounds or {}
+
+            columns = self._memoize(
+                'cell_sizes', df, required_columns,
+                lambda: self._cell_size_columns(df, required_columns, method, bounds),
+                method=method, bounds=sorted((axis, tuple(b)) for axis, b in bounds.items())
+            )
+            for col, values in columns.items():
+                # Копия: массивы в кэше не должны меняться вместе с таблицей
+                df[col] = values.copy()
+            logger.info(f"Размеры ячеек и вес рассчитаны (метод: {method})")
             return df
         
         except Exception as e:
             logger.error(f"Ошибка расчета ячеек: {str(e)}")
             raise
 
+    def _cell_size_columns(self, df: pd.DataFrame, axes: list, method: str, bounds: dict) -> dict:
+        """Массивы size_X/size_Y/size_Z и weight в порядке строк таблицы."""
+        columns = {}
+        weight = None
+        for axis in axes:
+            # Уникальные координаты и номер каждой строки среди них — за один проход
+            sorted_values, inverse = np.unique(df[axis].to_numpy(), return_inverse=True)
+            if len(sorted_values) < 2:
+                raise ValueError(f"Недостаточно данных для расчета размеров по {axis}")
+
+            if method == "centers":
+                # Размеры ячеек (расстояние между центрами), первая ячейка после стенки — как вторая
+                spacing = np.diff(sorted_values)
+                sizes = np.concatenate([spacing[:1], spacing])
+            else:
+                sizes = self._face_sizes(sorted_values, bounds.get(axis))
+
+            size = sizes[inverse.ravel()]
+            columns[f"size_{axis.split(' ')[0]}"] = size
+            weight = size if weight is None else weight * size
+
+        # Вес ячейки = объем (size_X * size_Y * size_Z)
+        columns["weight"] = weight
+        return columns
+
+    def _face_sizes(self, centers: np.ndarray, axis_bounds=None) -> np.ndarray:
+        """Размеры ячеек по граням, лежащим посередине между соседними центрами."""
+        inner_faces = 0.5 * (centers[1:] + centers[:-1])
+        if axis_bounds is not None:
+            first_face, last_face = axis_bounds
+        else:
+            first_face = 2 * centers[0] - inner_faces[0]
+            last_face = 2 * centers[-1] - inner_faces[-1]
+        faces = np.concatenate([[first_face], inner_faces, [last_face]])
+        return np.diff(faces)
+
     def process_data(self, df: pd.DataFrame, group_column: str, agg_method: str, use_weights: bool, target_columns: list) -> pd.DataFrame:
         """Основной метод агрегации данных."""
         # Валидация
@@ -75,13 +262,9 @@ class DataProcessor:
                 raise ValueError("Колонки для расчета весов отсутствуют!")
 
             df["weight"] = df[weight_cols].product(axis=1)
-            agg_func = lambda g: pd.Series({
-                col: np.average(g[col], weights=g["weight"]) for col in target_columns
-            })
-        else:
-            agg_func = lambda g: g[target_columns].agg(agg_method)
+            return self.weighted_group_stats(df, group_column, target_columns)
 
-        return df.groupby(group_column).apply(agg_func).reset_index()
+        return df.groupby(group_column)[target_columns].agg(agg_method).reset_index()
 
     def validate_columns(self, df: pd.DataFrame, required_columns: list):
         """Проверяет наличие необходимых колонок в DataFrame."""
@@ -102,13 +285,248 @@ class DataProcessor:
         """Усредняет данные по выбранной оси с учетом весов."""
         if "weight" not in df.columns:
             raise ValueError("Сначала рассчитайте веса!")
-        
-        grouped = df.groupby(group_column).apply(
-            lambda g: pd.Series({
-                col: np.average(g[col], weights=g["weight"]) for col in target_columns
-            })
+
+        return self.weighted_group_stats(df, group_column, target_columns)
+
+    def weighted_group_stats(self, df: pd.DataFrame, group_columns, target_columns: list,
+                             weight_column: str = "weight", with_variance: bool = False) -> pd.DataFrame:
+        """
+        Взвешенные средние по группам за один векторизованный проход.
+
+        Среднее считается как sum(w·x) / sum(w) сразу для всех колонок одним groupby.sum.
+
+        :param group_columns: Колонка или список колонок для группировки.
+        :param with_variance: Добавить взвешенную дисперсию '<col>_var' и RMS пульсаций '<col>_rms'.
+        :return: DataFrame с колонками группировки и результатами.
+        """
+        group_columns = [group_columns] if isinstance(group_columns, str) else list(group_columns)
+        target_columns = list(target_columns)
+        input_columns = group_columns + target_columns + [weight_column]
+        self.validate_columns(df, input_columns)
+        return self._memoize(
+            'weighted_group_stats', df, input_columns,
+            lambda: self._weighted_group_stats(df, group_columns, target_columns, weight_column, with_variance),
+            group_columns=group_columns, target_columns=target_columns, weight_column=weight_column,
+            with_variance=with_variance
+        )
+
+    def _weighted_group_stats(self, df, group_columns, target_columns, weight_column, with_variance):
+        # Накопление во float64, даже если данные хранятся во float32
+        weights = df[weight_column].to_numpy(dtype=np.float64)
+        values = df[target_columns].to_numpy(dtype=np.float64)
+        # Пропуски не участвуют ни в sum(w·x), ни в sum(w) своей колонки (как в aggregate_statistics)
+        missing = np.isnan(values)
+        column_weights = np.where(missing, 0.0, weights[:, np.newaxis])
+        values = np.where(missing, 0.0, values)
+        weighted = values * column_weights
+
+        sums = pd.DataFrame(np.hstack([column_weights, weighted]), index=df.index)
+        sums, codes = self._group_sum(df, sums, group_columns, return_codes=True)
+
+        n = len(target_columns)
+        sums_array = sums.to_numpy()
+        weight_sum = sums_array[:, :n]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # Группа без значений колонки дает NaN
+            mean = sums_array[:, n:] / weight_sum
+
+        result = pd.DataFrame(mean, columns=target_columns, index=sums.index)
+        if with_variance:
+            # Второй проход по отклонениям от среднего группы: E[x²] - E[x]² теряет все
+            # значащие разряды, когда среднее велико по сравнению с пульсациями
+            grouped_rows = codes >= 0
+            codes = codes[grouped_rows]
+            deviation = values[grouped_rows] - np.nan_to_num(mean)[codes]
+            squares = column_weights[grouped_rows] * deviation * deviation
+            with np.errstate(invalid='ignore', divide='ignore'):
+                variance = np.column_stack([
+                    np.bincount(codes, weights=squares[:, i], minlength=len(sums)) for i in range(n)
+                ]) / weight_sum
+            for i, col in enumerate(target_columns):
+                result[f"{col}_var"] = variance[:, i]
+                result[f"{col}_rms"] = np.sqrt(variance[:, i])
+        return result.reset_index()
+
+    def average_over_axes(self, df: pd.DataFrame, axes, target_columns: list, use_weights: bool = True) -> pd.DataFrame:
+        """
+        Осреднение по любому подмножеству осей X/Y/Z за один проход.
+
+        Например, axes=('Y (m)', 'Z (m)') дает профиль по X. Для структурированной сетки
+        колонки переводятся в массив (nx, ny, nz, k) и осредняются по осям сразу для всех
+        переменных; иначе используется одна векторная группировка по оставшимся осям.
+
+        :param use_weights: Взвешивать по объему ячеек (колонка 'weight').
+        :return: Колонки оставшихся осей и осредненные значения.
+        """
+        coordinate_columns = list(GridIndex.AXES)
+        axes = [axes] if isinstance(axes, str) else list(axes)
+        unknown = [axis for axis in axes if axis not in coordinate_columns]
+        if unknown or not axes:
+            raise ValueError(f"Осреднять можно только по осям {', '.join(coordinate_columns)}")
+        if use_weights and "weight" not in df.columns:
+            raise ValueError("Сначала рассчитайте веса!")
+        target_columns = list(target_columns)
+        input_columns = coordinate_columns + target_columns + (["weight"] if use_weights else [])
+        self.validate_columns(df, input_columns)
+        result = self._memoize(
+            'average_over_axes', df, input_columns,
+            lambda: self._average_over_axes(df, axes, target_columns, use_weights),
+            axes=sorted(axes), target_columns=target_columns, use_weights=use_weights
+        )
+        logger.info(f"Осреднение по осям {axes}: {len(result)} строк, переменных: {len(target_columns)}")
+        return result
+
+    def _average_over_axes(self, df, axes, target_columns, use_weights):
+        keep = [axis for axis in GridIndex.AXES if axis not in axes]
+        try:
+            grid = self.get_grid_index(df)
+        except ValueError:
+            grid = None
+
+        if grid is not None:
+            values = grid.fields(df, list(target_columns)).astype(np.float64, copy=False)
+            weights = grid.field(df, "weight").astype(np.float64) if use_weights else None
+            averaged = grid.plane_average(values, axes, weights)
+            kept_coordinates = [grid.coordinates[grid.axis_number(axis)] for axis in keep]
+            mesh = np.meshgrid(*kept_coordinates, indexing='ij') if keep else []
+            result = pd.DataFrame({axis: m.ravel() for axis, m in zip(keep, mesh)})
+            result[list(target_columns)] = averaged.reshape(-1, len(target_columns))
+        elif not keep:
+            values = df[target_columns].to_numpy(dtype=np.float64)
+            weights = df["weight"].to_numpy(dtype=np.float64) if use_weights else np.ones(len(df))
+            # Пропуски исключаются из суммы весов своей колонки, как в группировке
+            column_weights = np.where(np.isnan(values), 0.0, weights[:, np.newaxis])
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.nansum(values * column_weights, axis=0) / column_weights.sum(axis=0)
+            result = pd.DataFrame([mean], columns=target_columns)
+        elif use_weights:
+            result = self.weighted_group_stats(df, keep, target_columns)
+        else:
+            result = df.groupby(keep)[target_columns].mean().reset_index()
+        return result
+
+    def aggregate_statistics(self, df: pd.DataFrame, group_columns, target_columns: list,
+                             statistics=('mean',), quantiles=(), weight_column: str = "weight") -> pd.DataFrame:
+        """
+        Набор статистик по группам за один проход группировки.
+
+        Все моменты (count, sum, mean, std, min, max, weighted_mean) получаются одним вызовом
+        groupby.agg по вспомогательным колонкам x, w, w·x; медиана и квантили — одним
+        groupby.quantile с тем же разбиением.
+
+        :param group_columns: Колонка, список колонок или None (статистики по всей таблице).
+        :param statistics: Подмножество SUPPORTED_STATISTICS.
+        :param quantiles: Доли для квантилей, например (0.25, 0.75); в результате 'q0.25', 'q0.75'.
+        :return: Длинная таблица: колонки группировки, 'variable', 'statistic', 'value'.
+        """
+        if group_columns is None:
+            group_columns = []
+        elif isinstance(group_columns, str):
+            group_columns = [group_columns]
+        statistics = list(statistics)
+        unknown = [stat for stat in statistics if stat not in self.SUPPORTED_STATISTICS]
+        if unknown:
+            raise ValueError(f"Неподдерживаемые статистики: {', '.join(unknown)}")
+        if not statistics and not quantiles:
+            raise ValueError("Выберите хотя бы одну статистику")
+
+        required = group_columns + list(target_columns)
+        if 'weighted_mean' in statistics:
+            required.append(weight_column)
+        self.validate_columns(df, required)
+        target_columns = list(target_columns)
+        quantiles = tuple(quantiles)
+        return self._memoize(
+            'aggregate_statistics', df, required,
+            lambda: self._aggregate_statistics(df, group_columns, target_columns, statistics, quantiles, weight_column),
+            group_columns=group_columns, target_columns=target_columns, statistics=statistics,
+            quantiles=quantiles, weight_column=weight_column
         )
-        return grouped.reset_index()
+
+    def _aggregate_statistics(self, df, group_columns, target_columns, statistics, quantiles, weight_column):
+        # Вспомогательные колонки: для каждой целевой колонки i — x_i, w_i, wx_i
+        work = {}
+        agg_spec = {}
+        # std — собственная функция groupby (однопроходный алгоритм Уэлфорда): формула
+        # (Σx² - (Σx)²/n)/(n-1) теряет точность, когда среднее велико по сравнению с разбросом
+        x_funcs = [func for func in ('count', 'sum', 'min', 'max', 'std')
+                   if func in statistics or (func in ('count', 'sum') and 'mean' in statistics)]
+        for i, col in enumerate(target_columns):
+            x = df[col].astype(np.float64)
+            work[f"x{i}"] = x
+            if x_funcs:
+                agg_spec[f"x{i}"] = x_funcs
+            if 'weighted_mean' in statistics:
+                # Вес учитывается только там, где значение не пропущено
+                w = df[weight_column].astype(np.float64).where(x.notna())
+                work[f"w{i}"] = w
+                work[f"wx{i}"] = w * x
+                agg_spec[f"w{i}"] = ['sum']
+                agg_spec[f"wx{i}"] = ['sum']
+        work = pd.DataFrame(work, index=df.index)
+
+        keys = [df[col] for col in group_columns] if group_columns else np.zeros(len(df), dtype=np.int8)
+        grouped = work.groupby(keys, sort=True)
+
+        results = {}
+        if agg_spec:
+            sums = grouped.agg(agg_spec)
+            for i, col in enumerate(target_columns):
+                count = sums[(f"x{i}", 'count')] if 'count' in x_funcs else None
+                total = sums[(f"x{i}", 'sum')] if 'sum' in x_funcs else None
+                for stat in statistics:
+                    if stat in ('count', 'sum', 'min', 'max', 'std'):
+                        results[(col, stat)] = sums[(f"x{i}", stat)]
+                    elif stat == 'mean':
+                        results[(col, stat)] = total / count
+                    elif stat == 'weighted_mean':
+                        results[(col, stat)] = sums[(f"wx{i}", 'sum')] / sums[(f"w{i}", 'sum')]
+
+        levels = sorted(set(quantiles) | ({0.5} if 'median' in statistics else set()))
+        if levels:
+            value_columns = [f"x{i}" for i in range(len(target_columns))]
+            quantile_values = grouped[value_columns].quantile(levels).unstack(level=-1)
+            for i, col in enumerate(target_columns):
+                if 'median' in statistics:
+                    results[(col, 'median')] = quantile_values[(f"x{i}", 0.5)]
+                for q in quantiles:
+                    results[(col, f"q{q:g}")] = quantile_values[(f"x{i}", q)]
+
+        # Сборка длинной таблицы в порядке запрошенных колонок и статистик
+        order = [stat for stat in statistics] + [f"q{q:g}" for q in quantiles]
+        first = next(iter(results.values()))
+        group_frame = first.index.to_frame(index=False) if group_columns else pd.DataFrame(index=[0])
+        parts = []
+        for col in target_columns:
+            for stat in order:
+                part = group_frame.copy()
+                part['variable'] = col
+                part['statistic'] = stat
+                part['value'] = results[(col, stat)].to_numpy()
+                parts.append(part)
+        return pd.concat(parts, ignore_index=True)
+
+    def build_grid_index(self, df: pd.DataFrame, decimals=None) -> GridIndex:
+        """
+        Определяет структурированную сетку по X/Y/Z (m) и запоминает индекс.
+
+        :param decimals: Округление координат перед поиском уникальных значений.
+        """
+        try:
+            self.grid_index = GridIndex.from_frame(df, decimals=decimals)
+            logger.info(f"Построен индекс сетки {self.grid_index.shape}, "
+                        f"строки {'уже' if self.grid_index.is_sorted else 'не'} упорядочены")
+            return self.grid_index
+        except Exception as e:
+            logger.error(f"Ошибка построения индекса сетки: {str(e)}")
+            raise
+
+    def get_grid_index(self, df: pd.DataFrame) -> GridIndex:
+        """Возвращает индекс сетки для таблицы, перестраивая его при смене данных."""
+        decimals = df.attrs.get(self.DECIMALS_ATTR)
+        if self.grid_index is None or not self.grid_index.matches(df, decimals):
+            return self.build_grid_index(df, decimals=decimals)
+        return self.grid_index
 
     def calculate_unique_cells(self, df: pd.DataFrame) -> int:
         """
@@ -126,23 +544,83 @@ class DataProcessor:
         
         return total_cells
     
-    def filter_wall_values(self, df: pd.DataFrame, walls: dict) -> pd.DataFrame:
-        """Удаляет строки с координатами стенок."""
+    def detect_walls(self, df: pd.DataFrame) -> dict:
+        """
+        Находит граничные плоскости по крайним координатам каждой оси.
+
+        Для структурированной сетки берутся крайние значения из индекса сетки,
+        иначе — минимум и максимум колонки.
+
+        :return: Словарь {'x': [min, max], 'y': [...], 'z': [...]}.
+        """
+        self.validate_columns(df, list(GridIndex.AXES))
+        try:
+            grid = self.get_grid_index(df)
+        except ValueError:
+            grid = None
+
+        walls = {}
+        for i, axis in enumerate(GridIndex.AXES):
+            if grid is not None:
+                low, high = grid.coordinates[i][0], grid.coordinates[i][-1]
+            else:
+                values = df[axis].to_numpy()
+                low, high = np.nanmin(values), np.nanmax(values)
+            walls[axis[0].lower()] = [float(low), float(high)]
+        logger.info(f"Найдены стенки: {walls}")
+        return walls
+
+    def wall_mask(self, df: pd.DataFrame, walls: dict, tolerance: float = None) -> np.ndarray:
+        """
+        Маска строк, лежащих на стенках (True — строку нужно удалить).
+
+        Координата совпадает со стенкой, если отличается от нее не больше чем на tolerance,
+        поэтому шум последних разрядов не мешает. Поиск ближайшей стенки — бинарный
+        (searchsorted по отсортированным значениям стенок), без перебора.
+
+        :param tolerance: Абсолютный допуск; по умолчанию WALL_TOLERANCE от размаха оси.
+        """
+        mask = np.zeros(len(df), dtype=bool)
+        for axis in GridIndex.AXES:
+            wall_values = np.sort(np.asarray(walls.get(axis[0].lower(), []), dtype=np.float64))
+            if not len(wall_values):
+                continue
+            values = df[axis].to_numpy(dtype=np.float64)
+            if tolerance is None:
+                extent = np.nanmax(values) - np.nanmin(values) if len(values) else 0.0
+                axis_tolerance = self.WALL_TOLERANCE * max(extent, np.abs(wall_values).max(), 1e-30)
+            else:
+                axis_tolerance = tolerance
+
+            # Ближайшая стенка слева и справа от каждой координаты
+            pos = np.searchsorted(wall_values, values)
+            left = wall_values[np.clip(pos - 1, 0, len(wall_values) - 1)]
+            right = wall_values[np.clip(pos, 0, len(wall_values) - 1)]
+            distance = np.minimum(np.abs(values - left), np.abs(values - right))
+            mask |= distance <= axis_tolerance
+        return mask
+
+    def filter_wall_values(self, df: pd.DataFrame, walls: dict = None, tolerance: float = None) -> pd.DataFrame:
+        """
+        Удаляет строки с координатами стенок.
+
+        :param walls: Координаты стенок по осям; None — определить автоматически (detect_walls).
+        :param tolerance: Допуск совпадения координат (см. wall_mask).
+        """
         try:
             # Проверка наличия колонок
             required_columns = ['X (m)', 'Y (m)', 'Z (m)']
             if not all(col in df.columns for col in required_columns):
                 raise ValueError("Отсутствуют координатные колонки X/Y/Z (m)")
-            
-            # Фильтрация данных
-            mask = (
-                df['X (m)'].isin(walls['x']) |
-                df['Y (m)'].isin(walls['y']) |
-                df['Z (m)'].isin(walls['z'])
-            )
-            filtered_df = df[~mask].copy()
-            
-            logger.info(f"Удалено строк с стенками: {len(df) - len(filtered_df)}")
+            if walls is None:
+                walls = self.detect_walls(df)
+
+            # Фильтрация данных: строки выбираются один раз, без дополнительной копии
+            mask = self.wall_mask(df, walls, tolerance)
+            removed = int(np.count_nonzero(mask))
+            filtered_df = df.take(np.flatnonzero(~mask)) if removed else df
+
+            logger.info(f"Удалено строк с стенками: {removed}")
             return filtered_df
         
         except Exception as e:
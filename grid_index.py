@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+from result_cache import fingerprint
+
+
+def quantize(values, decimals: int) -> np.ndarray:
+    """
+    Целочисленные ключи координат с шагом 10**-decimals: round(value * 10**decimals) как int64.
+
+    key / 10**decimals совпадает с np.round(value, decimals), поэтому ключи и округленные
+    координаты взаимозаменяемы, а сортировка и поиск уникальных значений идут по целым.
+    """
+    scaled = np.rint(np.asarray(values, dtype=np.float64) * 10.0 ** decimals)
+    if not np.isfinite(scaled).all():
+        raise ValueError("Координаты содержат пропуски или бесконечности")
+    return scaled.astype(np.int64)
+
+
+def combine_keys(keys):
+    """
+    Сворачивает несколько целочисленных ключей в один int64 (смешанная система счисления).
+
+    Порядок составного ключа совпадает с лексикографическим порядком исходных ключей,
+    поэтому сортировка и группировка идут по одному массиву вместо нескольких.
+
+    :return: (ключ, минимумы, диапазоны) или None, если составной ключ не помещается в int64.
+    """
+    lows = [int(k.min()) for k in keys]
+    spans = [int(k.max()) - low + 1 for k, low in zip(keys, lows)]
+    if int(np.prod([float(span) for span in spans])) >= 2 ** 62:
+        return None
+    combined = np.zeros(len(keys[0]), dtype=np.int64)
+    for k, low, span in zip(keys, lows, spans):
+        combined *= span
+        combined += k - low
+    return combined, lows, spans
+
+
+def split_keys(combined, lows, spans):
+    """Обратное к combine_keys преобразование: список исходных ключей."""
+    keys = []
+    rest = np.asarray(combined, dtype=np.int64)
+    for low, span in zip(lows[::-1], spans[::-1]):
+        rest, digit = np.divmod(rest, span)
+        keys.append(digit + low)
+    return keys[::-1]
+
+
+class GridIndex:
+    """
+    Индекс структурированной сетки поверх плоской таблицы.
+
+    Один раз определяет уникальные координаты по каждой оси и перестановку строк,
+    после которой любая колонка превращается в непрерывный массив (nx, ny, nz).
+    Срезы, осреднения по плоскостям и извлечение линий становятся операциями
+    над массивом вместо groupby и булевых масок.
+    """
+    AXES = ('X (m)', 'Y (m)', 'Z (m)')
+
+    def __init__(self, coordinates, permutation, n_rows, columns=AXES, source=None, decimals=None):
+        self.coordinates = coordinates  # Кортеж отсортированных уникальных координат по осям
+        self.permutation = permutation  # Номера строк в порядке (x, y, z)
+        self.n_rows = n_rows
+        self.columns = tuple(columns)
+        self.source = source            # Отпечаток координатных колонок, по которым построен индекс
+        self.decimals = decimals
+        self.is_sorted = bool(np.array_equal(permutation, np.arange(n_rows)))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns=AXES, decimals=None):
+        """
+        Строит индекс по координатным колонкам.
+
+        :param decimals: Округление координат перед поиском уникальных значений
+                         (подавляет шум последних разрядов).
+        :raises ValueError: Если точки не образуют полную структурированную сетку.
+        """
+        missing = [col for col in columns if col not in df.columns]
+        if missing:
+            raise ValueError(f"Отсутствуют координатные колонки: {', '.join(missing)}")
+
+        coordinates = []
+        inverse = []
+        for col in columns:
+            values = df[col].to_numpy(dtype=np.float64)
+            # Хэш-факторизация: на сетке уникальных значений мало, это быстрее сортировки np.unique
+            if decimals is not None:
+                # Уникальные значения ищем по целочисленным ключам
+                codes, unique = pd.factorize(quantize(values, decimals), sort=True)
+                unique = unique / 10.0 ** decimals
+            else:
+                codes, unique = pd.factorize(values, sort=True)
+            if (codes < 0).any():
+                raise ValueError(f"Колонка {col} содержит пропуски")
+            coordinates.append(np.asarray(unique, dtype=np.float64))
+            inverse.append(codes)
+
+        shape = tuple(len(axis) for axis in coordinates)
+        n_rows = len(df)
+        if int(np.prod(shape)) != n_rows:
+            raise ValueError(f"Сетка не структурированная: {n_rows} точек при размерах {shape}")
+
+        flat = np.ravel_multi_index(inverse, shape)
+        permutation = np.full(n_rows, -1, dtype=np.intp)
+        permutation[flat] = np.arange(n_rows)
+        if (permutation < 0).any():
+            raise ValueError("Сетка не структурированная: координаты точек повторяются")
+        return cls(tuple(coordinates), permutation, n_rows, columns,
+                   source=fingerprint(df, columns), decimals=decimals)
+
+    @property
+    def shape(self):
+        return tuple(len(axis) for axis in self.coordinates)
+
+    @property
+    def n_cells(self):
+        return int(np.prod(self.shape))
+
+    def axis_number(self, axis):
+        """Номер оси по имени колонки ('X (m)'), букве ('x') или номеру."""
+        if isinstance(axis, (int, np.integer)):
+            return int(axis)
+        if axis in self.columns:
+            return self.columns.index(axis)
+        letters = [col[0].lower() for col in self.columns]
+        if str(axis).lower() in letters:
+            return letters.index(str(axis).lower())
+        raise ValueError(f"Неизвестная ось: {axis}")
+
+    def matches(self, df: pd.DataFrame, decimals=None) -> bool:
+        """
+        Подходит ли индекс к таблице: те же координаты в том же порядке строк.
+
+        Сравнивается отпечаток координатных колонок, а не только число строк:
+        пересортированная таблица или другой набор данных той же длины требуют нового индекса.
+        """
+        if len(df) != self.n_rows or decimals != self.decimals or self.source is None:
+            return False
+        if any(col not in df.columns for col in self.columns):
+            return False
+        return fingerprint(df, self.columns) == self.source
+
+    def reshape(self, values) -> np.ndarray:
+        """Плоская колонка -> непрерывный массив (nx, ny, nz)."""
+        values = np.asarray(values)
+        if len(values) != self.n_rows:
+            raise ValueError("Длина колонки не совпадает с индексом сетки")
+        if self.is_sorted:
+            # Строки уже в порядке x -> y -> z: представление без копирования
+            return values.reshape(self.shape)
+        return values[self.permutation].reshape(self.shape)
+
+    def field(self, df: pd.DataFrame, column: str) -> np.ndarray:
+        return self.reshape(df[column].to_numpy())
+
+    def fields(self, df: pd.DataFrame, columns: list) -> np.ndarray:
+        """Несколько колонок сразу: массив (nx, ny, nz, n_columns)."""
+        values = df[columns].to_numpy()
+        if not self.is_sorted:
+            values = values[self.permutation]
+        return values.reshape(self.shape + (len(columns),))
+
+    def to_flat(self, array) -> np.ndarray:
+        """Обратное преобразование: массив (nx, ny, nz) -> колонка в порядке строк таблицы."""
+        array = np.asarray(array).reshape(self.n_rows, *np.shape(array)[3:])
+        if self.is_sorted:
+            return array
+        flat = np.empty_like(array)
+        flat[self.permutation] = array
+        return flat
+
+    def slice(self, array, axis, index):
+        """Плоскость с номером index поперек оси axis (без копирования)."""
+        return np.take(array, index, axis=self.axis_number(axis))
+
+    def line(self, array, axis, at):
+        """
+        Линия вдоль оси axis.
+
+        :param at: Индексы по двум другим осям в порядке x, y, z.
+        """
+        axis = self.axis_number(axis)
+        index = list(at)
+        index.insert(axis, slice(None))
+        return array[tuple(index)]
+
+    def plane_average(self, array, axes, weights=None):
+        """
+        Осреднение по одной или нескольким осям.
+
+        Пропуски (NaN) не участвуют ни в сумме значений, ни в сумме весов своей колонки,
+        как при группировке неструктурированных таблиц; точка без значений дает NaN.
+
+        :param axes: Оси, по которым осредняем (например, ('Y (m)', 'Z (m)') -> профиль по X).
+        :param weights: Массив весов формы (nx, ny, nz) или None.
+        """
+        axes = tuple(self.axis_number(axis) for axis in ([axes] if isinstance(axes, (str, int)) else axes))
+        missing = np.isnan(array)
+        has_missing = bool(missing.any())
+        if weights is None:
+            if not has_missing:
+                return array.mean(axis=axes)
+            weights = np.ones(array.shape[:3])
+        weights = np.asarray(weights)
+        # Для массива нескольких колонок (nx, ny, nz, k) веса расширяем на последнюю ось
+        weights = weights.reshape(weights.shape + (1,) * (array.ndim - weights.ndim))
+        if has_missing:
+            weights = np.where(missing, 0.0, weights)
+            array = np.where(missing, 0.0, array)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (array * weights).sum(axis=axes) / weights.sum(axis=axes)
@@ -0,0 +1,99 @@
+import pandas as pd
+from logger import logger
+
+
+class LazyFrame:
+    """
+    Таблица, колонки которой читаются из CSV только при первом обращении.
+
+    При создании известны лишь заголовки. Обращение data_frame[col] или
+    data_frame[[col1, col2]] подгружает недостающие колонки и запоминает их,
+    поэтому меню колонок, графики и спектры работают без чтения всего файла.
+    """
+
+    def __init__(self, file_path, columns, loader, n_rows=None):
+        self.file_path = file_path
+        self.loader = loader
+        self._columns = list(columns)
+        self._loaded = {}
+        self._extra = pd.DataFrame()  # Колонки, добавленные в памяти (например, спектр ТКЭ)
+        self._n_rows = n_rows  # Число строк файла, если уже подсчитано при загрузке
+
+    @property
+    def columns(self):
+        return pd.Index(self._columns + [col for col in self._extra.columns if col not in self._columns])
+
+    @property
+    def empty(self):
+        return len(self.columns) == 0
+
+    @property
+    def loaded_columns(self):
+        """Колонки, которые уже прочитаны из файла."""
+        return list(self._loaded)
+
+    def __len__(self):
+        if self._n_rows is None:
+            if self._loaded:
+                self._n_rows = len(next(iter(self._loaded.values())))
+            else:
+                self._n_rows = self.loader.count_csv_rows(self.file_path)
+        return max(self._n_rows, len(self._extra))
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.project([key])[key]
+        return self.project(list(key))
+
+    def project(self, columns):
+        """Возвращает DataFrame только с указанными колонками, подгружая недостающие."""
+        missing = [col for col in columns if col not in self.columns]
+        if missing:
+            raise KeyError(f"Колонки отсутствуют: {missing}")
+
+        to_load = [col for col in columns if col in self._columns and col not in self._loaded]
+        if to_load:
+            loaded = self.loader.load_csv_columns(self.file_path, to_load)
+            for col in to_load:
+                self._loaded[col] = loaded[col]
+            self._n_rows = len(loaded)
+            logger.info(f"Подгружены колонки {to_load} из {self.file_path}")
+
+        series = {
+            col: self._loaded[col] if col in self._loaded else self._extra[col]
+            for col in columns
+        }
+        return pd.concat(series, axis=1)
+
+    def head(self, n=5):
+        head = pd.read_csv(self.file_path, nrows=n)
+        if not self._extra.empty:
+            head = pd.concat([head, self._extra.head(n)], axis=1)
+        return head
+
+    def add_columns(self, data_frame):
+        """Добавляет вычисленные колонки, не трогая колонки файла (аналог pd.concat по axis=1)."""
+        self._extra = pd.concat([self._extra, data_frame], axis=1)
+
+    def materialize(self, progress_callback=None):
+        """
+        Полная загрузка файла потоковым загрузчиком (с прогрессом, отменой и бинарным кэшем).
+
+        Выполняется в рабочем потоке; последующие обращения к колонкам этого файла
+        обслуживаются из кэша.
+        """
+        data_frame = self.loader.load_csv_chunked(self.file_path, progress_callback=progress_callback)
+        data_frame = data_frame[self._columns]
+        if not self._extra.empty:
+            data_frame = pd.concat([data_frame, self._extra], axis=1)
+        return data_frame
+
+    def to_frame(self):
+        """Полностью материализует таблицу."""
+        data_frame = self.project(self._columns)
+        if not self._extra.empty:
+            data_frame = pd.concat([data_frame, self._extra], axis=1)
+        return data_frame
@@ -1,53 +1,359 @@
-import pandas as pd
-import tkinter as tk
-from tkinter import filedialog
+import argparse
 import csv
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # без pyarrow читаем и пишем средствами pandas
+    pa = None
+    pa_csv = None
 
-# Скрываем главное окно Tkinter
-root = tk.Tk()
-root.withdraw()
 
-# Запрос выбора CSV файлов (несколько файлов можно выбрать)
-file_paths = filedialog.askopenfilenames(
-    title="Выберите CSV файлы",
-    filetypes=[("CSV файлы", "*.csv")]
-)
+def read_table(path):
+    """Читает одну таблицу (CSV, Parquet или Feather)."""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    if path.endswith('.feather'):
+        return pd.read_feather(path)
+    return pd.read_csv(path, engine='pyarrow' if pa is not None else 'c')
 
-if not file_paths:
-    print("Файлы не выбраны!")
-    exit()
 
-# Читаем каждый выбранный файл в DataFrame
-dataframes = []
-for path in file_paths:
+def _read_table_safe(path):
+    # Выполняется в дочернем процессе: ошибку возвращаем, а не выбрасываем,
+    # чтобы один битый файл не останавливал пакетную обработку
     try:
-        df = pd.read_csv(path)
-        dataframes.append(df)
+        return path, read_table(path), None
     except Exception as e:
-        print(f"Ошибка при чтении файла {path}: {e}")
-
-if not dataframes:
-    print("Нет корректных файлов для обработки!")
-    exit()
-
-# Объединяем таблицы столбец за столбцом.
-# Используем innerjoin (или объединяем с outer и затем dropna), чтобы удалить строки с пустыми ячейками,
-# появляющимися из-за различного количества строк.
-merged_df = pd.concat(dataframes, axis=1, join='inner')
-
-# Удаляем строки, где имеется хотя бы одна пустая ячейка
-merged_df.dropna(axis=0, how='any', inplace=True)
-
-# Сохраняем итоговую таблицу в новый CSV файл.
-# Параметр quoting=csv.QUOTE_ALL заставит взять в кавычки все поля, в том числе и названия колонок.
-output_file = filedialog.asksaveasfilename(
-    title="Сохранить объединённый CSV",
-    defaultextension=".csv",
-    filetypes=[("CSV файлы", "*.csv")]
-)
-
-if output_file:
-    merged_df.to_csv(output_file, index=False, quoting=csv.QUOTE_ALL)
-    print(f"Файл успешно сохранён: {output_file}")
-else:
-    print("Сохранение отменено.")
+        return path, None, str(e)
+
+
+def read_tables(file_paths, max_workers=None):
+    """
+    Параллельно читает таблицы в пуле процессов, сохраняя порядок файлов.
+
+    Файлы, которые не удалось прочитать, пропускаются с сообщением.
+    """
+    if len(file_paths) == 1 or max_workers == 1:
+        results = [_read_table_safe(path) for path in file_paths]
+    else:
+        max_workers = max_workers or min(len(file_paths), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_read_table_safe, file_paths))
+
+    dataframes = []
+    for path, df, error in results:
+        if error is not None:
+            print(f"Ошибка при чтении файла {path}: {error}")
+        else:
+            dataframes.append(df)
+    return dataframes
+
+
+def merge_tables(file_paths, max_workers=None):
+    """
+    Объединяет таблицы столбец за столбцом.
+
+    Строки выравниваются по позиции (inner join по индексу), затем удаляются
+    строки, где имеется хотя бы одна пустая ячейка.
+    """
+    dataframes = read_tables(list(file_paths), max_workers)
+    merged_df = concat_tables(dataframes)
+    # Исходные таблицы больше не нужны
+    dataframes.clear()
+    return merged_df
+
+
+def concat_tables(dataframes, suffixes=None):
+    """
+    Позиционное объединение уже загруженных таблиц с удалением строк с пропусками.
+
+    :param suffixes: Суффиксы колонок для каждой таблицы; по умолчанию имена не меняются.
+    """
+    if not dataframes:
+        raise ValueError("Нет корректных файлов для обработки!")
+    if suffixes is not None:
+        dataframes = [df.add_suffix(suffix) if suffix else df for df, suffix in zip(dataframes, suffixes)]
+
+    merged_df = pd.concat(dataframes, axis=1, join='inner')
+    merged_df.dropna(axis=0, how='any', inplace=True)
+    return merged_df
+
+
+def write_table(df, output_file):
+    """
+    Сохраняет таблицу. Формат определяется по расширению (.csv, .parquet, .feather).
+
+    CSV пишется с кавычками у всех полей, в том числе у названий колонок.
+    """
+    if output_file.endswith('.parquet'):
+        df.to_parquet(output_file, index=False)
+    elif output_file.endswith('.feather'):
+        df.reset_index(drop=True).to_feather(output_file)
+    elif pa_csv is not None and df.columns.is_unique:
+        # Многопоточная запись pyarrow; для дублирующихся имен колонок — pandas
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pa_csv.write_csv(table, output_file, pa_csv.WriteOptions(quoting_style='all_valid'))
+    else:
+        df.to_csv(output_file, index=False, quoting=csv.QUOTE_ALL)
+
+
+def merge_files(file_paths, output_file, max_workers=None):
+    """Читает, объединяет и сохраняет таблицы; возвращает объединенный DataFrame."""
+    merged_df = merge_tables(file_paths, max_workers)
+    write_table(merged_df, output_file)
+    return merged_df
+
+
+def default_suffixes(n_tables):
+    """Суффиксы колонок как в combined_tables.csv: первая таблица без суффикса, далее _11, _12, ..."""
+    return [''] + [f"_{10 + i}" for i in range(1, n_tables)]
+
+
+class _SortedTableStream:
+    """Поблочное чтение таблицы, отсортированной по ключевой колонке, с буфером строк."""
+
+    def __init__(self, path, key, chunk_size, suffix):
+        self.path = path
+        self.key = key
+        self.suffix = suffix
+        self.reader = pd.read_csv(path, chunksize=chunk_size)
+        self.keys = np.empty(0)
+        self.frame = None
+        self.exhausted = False
+        self.last_key = -np.inf
+
+    def read_chunk(self):
+        """Следующий блок: (ключи, DataFrame с суффиксами) или None в конце файла."""
+        chunk = next(self.reader, None)
+        if chunk is None:
+            self.exhausted = True
+            return None
+        if self.key not in chunk.columns:
+            raise ValueError(f"В файле {self.path} нет ключевой колонки '{self.key}'")
+
+        keys = chunk[self.key].to_numpy(dtype=float)
+        if len(keys) and (keys[0] < self.last_key or np.any(np.diff(keys) < 0)):
+            raise ValueError(f"Файл {self.path} не отсортирован по колонке '{self.key}'")
+        if len(keys):
+            self.last_key = keys[-1]
+
+        chunk.columns = [f"{col}{self.suffix}" for col in chunk.columns]
+        return keys, chunk.reset_index(drop=True)
+
+    def fill_until(self, bound):
+        """Дочитывает блоки, пока в буфере не появится ключ больше bound."""
+        while not self.exhausted and (len(self.keys) == 0 or self.keys[-1] <= bound):
+            block = self.read_chunk()
+            if block is None:
+                break
+            keys, chunk = block
+            self.keys = np.concatenate([self.keys, keys])
+            self.frame = chunk if self.frame is None else pd.concat([self.frame, chunk], ignore_index=True)
+
+    def discard_below(self, bound):
+        """Удаляет из буфера строки, которые уже не могут совпасть ни с одним ключом."""
+        start = np.searchsorted(self.keys, bound, side='left')
+        if start:
+            self.keys = self.keys[start:]
+            self.frame = self.frame.iloc[start:].reset_index(drop=True)
+
+    def match(self, anchor_keys, tolerance):
+        """Ближайшая строка буфера для каждого ключа и признак попадания в допуск."""
+        n = len(self.keys)
+        if n == 0:
+            return np.zeros(len(anchor_keys), dtype=np.intp), np.zeros(len(anchor_keys), dtype=bool)
+
+        pos = np.searchsorted(self.keys, anchor_keys)
+        left = np.clip(pos - 1, 0, n - 1)
+        right = np.clip(pos, 0, n - 1)
+        use_left = np.abs(anchor_keys - self.keys[left]) <= np.abs(self.keys[right] - anchor_keys)
+        nearest = np.where(use_left, left, right)
+        return nearest, np.abs(self.keys[nearest] - anchor_keys) <= tolerance
+
+    def matched_rows(self, anchor_keys, tolerance):
+        """
+        Строки буфера, сопоставленные ключам (NaN там, где совпадения нет), и признак попадания.
+
+        Пустой буфер (таблица короче опорной или уже дочитана) дает блок из NaN нужной длины.
+        """
+        nearest, found = self.match(anchor_keys, tolerance)
+        if self.frame is None:
+            return pd.DataFrame(index=range(len(anchor_keys))), found
+        if len(self.keys) == 0:
+            return self.frame.iloc[:0].reindex(range(len(anchor_keys))), found
+        matched = self.frame.iloc[nearest].reset_index(drop=True)
+        return matched.where(pd.Series(found), np.nan, axis=0), found
+
+
+def merge_on_key(file_paths, output_file, key, tolerance=0.0, how='inner', suffixes=None, chunk_size=100_000):
+    """
+    Потоковое объединение таблиц по ключевой координате (sorted merge join с допуском).
+
+    Все файлы должны быть отсортированы по колонке key. Строки первой таблицы служат опорными:
+    каждой из них сопоставляется ближайшая по ключу строка остальных таблиц, если расстояние
+    не превышает tolerance. В памяти одновременно держится только по блоку каждой таблицы.
+
+    :param how: 'inner' — только строки, найденные во всех таблицах; 'left' — все строки
+                первой таблицы, отсутствующие значения заполняются NaN.
+    :param suffixes: Суффиксы колонок для каждой таблицы (по умолчанию '', '_11', '_12', ...).
+    :return: Количество записанных строк.
+    """
+    if how not in ('inner', 'left'):
+        raise ValueError(f"Неподдерживаемый режим объединения: {how}")
+    file_paths = list(file_paths)
+    if len(file_paths) < 2:
+        raise ValueError("Для объединения нужно минимум два файла")
+    suffixes = suffixes or default_suffixes(len(file_paths))
+
+    anchor = _SortedTableStream(file_paths[0], key, chunk_size, suffixes[0])
+    others = [
+        _SortedTableStream(path, key, chunk_size, suffix)
+        for path, suffix in zip(file_paths[1:], suffixes[1:])
+    ]
+
+    # Пишем во временный файл и переименовываем только после успешного объединения,
+    # чтобы ошибка посреди потока не оставляла обрезанный итоговый файл
+    temp_file = f"{output_file}.tmp"
+    n_written = 0
+    header = True
+    try:
+        while True:
+            block = anchor.read_chunk()
+            if block is None:
+                break
+            anchor_keys, anchor_frame = block
+            if not len(anchor_keys):
+                continue
+
+            parts = [anchor_frame]
+            found_all = np.ones(len(anchor_keys), dtype=bool)
+            for stream in others:
+                stream.fill_until(anchor_keys[-1] + tolerance)
+                matched, found = stream.matched_rows(anchor_keys, tolerance)
+                parts.append(matched)
+                found_all &= found
+                # Следующие опорные ключи не меньше текущего максимума
+                stream.discard_below(anchor_keys[-1] - tolerance)
+
+            merged = pd.concat(parts, axis=1)
+            if how == 'inner':
+                merged = merged[found_all]
+            merged.to_csv(temp_file, mode='w' if header else 'a', header=header,
+                          index=False, quoting=csv.QUOTE_ALL)
+            header = False
+            n_written += len(merged)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+    if header:
+        # Опорная таблица пуста — итоговый файл все равно создается
+        open(temp_file, 'w').close()
+    os.replace(temp_file, output_file)
+    return n_written
+
+
+def expand_inputs(inputs):
+    """Раскрывает шаблоны и папки в упорядоченный список файлов."""
+    file_paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            file_paths.extend(sorted(glob.glob(os.path.join(item, '*.csv'))))
+        elif glob.has_magic(item):
+            file_paths.extend(sorted(glob.glob(item)))
+        else:
+            file_paths.append(item)
+    return file_paths
+
+
+def run_dialog():
+    """Интерактивный режим: выбор файлов и места сохранения через диалоги Tkinter."""
+    import tkinter as tk
+    from tkinter import filedialog
+
+    # Скрываем главное окно Tkinter
+    root = tk.Tk()
+    root.withdraw()
+
+    # Запрос выбора CSV файлов (несколько файлов можно выбрать)
+    file_paths = filedialog.askopenfilenames(
+        title="Выберите CSV файлы",
+        filetypes=[("CSV файлы", "*.csv")]
+    )
+
+    if not file_paths:
+        print("Файлы не выбраны!")
+        return 1
+
+    try:
+        merged_df = merge_tables(file_paths)
+    except ValueError as e:
+        print(e)
+        return 1
+
+    output_file = filedialog.asksaveasfilename(
+        title="Сохранить объединённый CSV",
+        defaultextension=".csv",
+        filetypes=[("CSV файлы", "*.csv")]
+    )
+
+    if output_file:
+        write_table(merged_df, output_file)
+        print(f"Файл успешно сохранён: {output_file}")
+    else:
+        print("Сохранение отменено.")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Объединение таблиц столбец за столбцом. Без аргументов открывает диалог выбора файлов."
+    )
+    parser.add_argument('inputs', nargs='*', help="CSV файлы, шаблоны (*.csv) или папки")
+    parser.add_argument('-o', '--output', help="Итоговый файл (.csv, .parquet, .feather)")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="Число процессов для чтения")
+    parser.add_argument('-k', '--key', help="Ключевая колонка для объединения по координате "
+                                            "(например, 'Centroid[X] (m)_rounded')")
+    parser.add_argument('-t', '--tolerance', type=float, default=0.0, help="Допуск совпадения ключа")
+    parser.add_argument('--how', choices=['inner', 'left'], default='inner',
+                        help="Режим объединения по ключу")
+    args = parser.parse_args(argv)
+
+    if not args.inputs:
+        return run_dialog()
+    if not args.output:
+        parser.error("Укажите итоговый файл через -o/--output")
+
+    file_paths = expand_inputs(args.inputs)
+    if not file_paths:
+        print("Файлы не найдены!")
+        return 1
+
+    if args.key:
+        try:
+            n_rows = merge_on_key(file_paths, args.output, args.key, args.tolerance, args.how)
+        except ValueError as e:
+            print(e)
+            return 1
+        print(f"Объединено по ключу файлов: {len(file_paths)}, строк: {n_rows}. Файл сохранён: {args.output}")
+        return 0
+
+    try:
+        merged_df = merge_files(file_paths, args.output, args.jobs)
+    except ValueError as e:
+        print(e)
+        return 1
+    print(f"Объединено файлов: {len(file_paths)}, строк: {len(merged_df)}. Файл сохранён: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,202 @@
+import json
+import numpy as np
+import pandas as pd
+from logger import logger
+
+
+class ProcessingPipeline:
+    """
+    Отложенный план обработки данных.
+
+    Операции вкладки "Данные" (округление, удаление стенок, расчет ячеек, агрегация)
+    сначала записываются, а затем выполняются одним слитым проходом:
+    - сортировка по X/Y/Z выполняется один раз в конце и пропускается, если дальше есть агрегация;
+    - несколько фильтров объединяются в одну маску, строки копируются один раз;
+    - перед агрегацией округляются только колонки, которые в нее попадут.
+    План можно сохранить в JSON и повторить на следующем наборе данных.
+    """
+    COORDINATE_COLUMNS = ['X (m)', 'Y (m)', 'Z (m)']
+    STEP_NAMES = {
+        'round': 'Округление',
+        'filter_walls': 'Удаление стенок',
+        'cell_sizes': 'Расчет ячеек',
+        'aggregate': 'Агрегация',
+        'average': 'Осреднение по осям',
+    }
+
+    def __init__(self, steps=None):
+        self.steps = list(steps or [])
+
+    # --- Запись операций ---
+    def round_columns(self, columns, decimals, quantize=False):
+        self.steps.append({'op': 'round', 'columns': list(columns), 'decimals': int(decimals),
+                           'quantize': bool(quantize)})
+        return self
+
+    def filter_walls(self, walls=None, tolerance=None):
+        """walls=None — стенки определяются автоматически на каждом наборе данных."""
+        if walls is not None:
+            walls = {axis: [float(v) for v in values] for axis, values in walls.items()}
+        self.steps.append({'op': 'filter_walls', 'walls': walls, 'tolerance': tolerance})
+        return self
+
+    def calculate_cell_sizes(self, method='centers'):
+        self.steps.append({'op': 'cell_sizes', 'method': method})
+        return self
+
+    def aggregate(self, group_column, target_columns):
+        self.steps.append({'op': 'aggregate', 'group_column': group_column, 'target_columns': list(target_columns)})
+        return self
+
+    def average(self, axes, target_columns):
+        self.steps.append({'op': 'average', 'axes': list(axes), 'target_columns': list(target_columns)})
+        return self
+
+    def clear(self):
+        self.steps.clear()
+
+    def __len__(self):
+        return len(self.steps)
+
+    # --- План ---
+    def describe(self):
+        """Текстовое описание плана с учетом слияния шагов."""
+        if not self.steps:
+            return "План пуст"
+
+        lines = []
+        reduce_index = self._reduce_index()
+        needed = self._columns_needed_after(reduce_index) if reduce_index is not None else None
+        for i, step in enumerate(self.steps, start=1):
+            name = self.STEP_NAMES[step['op']]
+            if step['op'] == 'round':
+                columns = step['columns'] if needed is None or i - 1 > reduce_index \
+                    else [col for col in step['columns'] if col in needed]
+                keys = " (целочисленные ключи)" if step.get('quantize') else ""
+                lines.append(f"{i}. {name}: {columns} до {step['decimals']} знаков{keys}")
+            elif step['op'] == 'filter_walls':
+                walls = step['walls'] if step['walls'] is not None else "определяются автоматически"
+                lines.append(f"{i}. {name}: {walls}")
+            elif step['op'] == 'cell_sizes':
+                lines.append(f"{i}. {name} (метод: {step['method']})")
+            elif step['op'] == 'aggregate':
+                lines.append(f"{i}. {name} по {step['group_column']}: {step['target_columns']}")
+            else:
+                lines.append(f"{i}. {name} {step['axes']}: {step['target_columns']}")
+
+        if any(step['op'] == 'filter_walls' for step in self.steps):
+            lines.append("• Фильтры объединяются в одну маску, строки копируются один раз")
+        if any(step['op'] == 'round' for step in self.steps):
+            if reduce_index is not None and self._sort_index() is not None and self._sort_index() < reduce_index:
+                lines.append("• Сортировка по X/Y/Z не нужна: дальше агрегация")
+            else:
+                lines.append("• Сортировка по X/Y/Z выполняется один раз в конце")
+        return "\n".join(lines)
+
+    def _reduce_index(self):
+        """Номер первого шага, сокращающего таблицу до агрегатов."""
+        for i, step in enumerate(self.steps):
+            if step['op'] in ('aggregate', 'average'):
+                return i
+        return None
+
+    def _sort_index(self):
+        """Номер последнего округления (после него требуется сортировка)."""
+        indices = [i for i, step in enumerate(self.steps) if step['op'] == 'round']
+        return indices[-1] if indices else None
+
+    def _columns_needed_after(self, index):
+        """Колонки, которые читают шаги начиная с index (для проекции округления)."""
+        needed = set(self.COORDINATE_COLUMNS) | {'weight'}
+        for step in self.steps[index:]:
+            if step['op'] == 'aggregate':
+                needed |= {step['group_column'], *step['target_columns']}
+            elif step['op'] == 'average':
+                needed |= set(step['target_columns'])
+        return needed
+
+    # --- Выполнение ---
+    def execute(self, df: pd.DataFrame, processor) -> pd.DataFrame:
+        """
+        Выполняет план над таблицей, не изменяя исходный DataFrame.
+
+        :param processor: DataProcessor, реализующий сами операции.
+        """
+        try:
+            reduce_index = self._reduce_index()
+            needed = self._columns_needed_after(reduce_index) if reduce_index is not None else None
+            sort_pending = False
+            mask = None  # Отложенная маска оставляемых строк
+
+            # Поверхностная копия: замена колонок не затрагивает исходную таблицу
+            df = df.copy(deep=False)
+            for i, step in enumerate(self.steps):
+                op = step['op']
+                if op == 'round':
+                    columns = step['columns']
+                    if needed is not None and i < reduce_index:
+                        columns = [col for col in columns if col in needed]
+                    processor.validate_columns(df, columns)
+                    if step.get('quantize'):
+                        df = processor.quantize_columns(df, columns, step['decimals'])
+                    else:
+                        for col in columns:
+                            df[col] = df[col].round(step['decimals'])
+                        if any(col in self.COORDINATE_COLUMNS for col in columns):
+                            df.attrs.pop(processor.SORTED_ATTR, None)
+                            df.attrs.pop(processor.DECIMALS_ATTR, None)
+                    sort_pending = True
+                elif op == 'filter_walls':
+                    walls = step['walls'] if step['walls'] is not None else processor.detect_walls(df)
+                    keep = ~processor.wall_mask(df, walls, step.get('tolerance'))
+                    mask = keep if mask is None else mask & keep
+                else:
+                    # Дальше нужны сами строки — применяем накопленную маску один раз
+                    df, mask = self._apply_mask(df, mask)
+                    if op == 'cell_sizes':
+                        df = processor.calculate_cell_sizes(df, method=step['method'])
+                    elif op == 'aggregate':
+                        df = processor.aggregate_data(df, step['group_column'], step['target_columns'])
+                        sort_pending = False  # Результат groupby уже упорядочен по ключу
+                    elif op == 'average':
+                        df = processor.average_over_axes(df, step['axes'], step['target_columns'])
+                        sort_pending = False
+
+            df, mask = self._apply_mask(df, mask)
+            if df.empty:
+                raise ValueError("Нет данных после выполнения плана")
+            if sort_pending:
+                df = processor.sort_by_coordinates(df)
+            logger.info(f"План обработки выполнен: шагов {len(self.steps)}, строк {len(df)}")
+            return df
+        except Exception as e:
+            logger.error(f"Ошибка выполнения плана обработки: {str(e)}")
+            raise
+
+    def _apply_mask(self, df, mask):
+        if mask is None:
+            return df, None
+        removed = int(len(mask) - np.count_nonzero(mask))
+        logger.info(f"Удалено строк с стенками: {removed}")
+        return df.take(np.flatnonzero(mask)), None
+
+    # --- Сохранение ---
+    def to_json(self):
+        return json.dumps({'steps': self.steps}, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def from_json(cls, text):
+        steps = json.loads(text).get('steps', [])
+        unknown = [step.get('op') for step in steps if step.get('op') not in cls.STEP_NAMES]
+        if unknown:
+            raise ValueError(f"Неизвестные шаги плана: {unknown}")
+        return cls(steps)
+
+    def save(self, file_path):
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_json())
+
+    @classmethod
+    def load(cls, file_path):
+        with open(file_path, encoding='utf-8') as f:
+            return cls.from_json(f.read())
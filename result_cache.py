@@ -0,0 +1,154 @@
+import os
+import pickle
+import hashlib
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from logger import logger
+
+
+def fingerprint(df: pd.DataFrame, columns) -> str:
+    """
+    Отпечаток содержимого колонок: имена, типы, длина и байты значений.
+
+    Хэширование — один линейный проход по памяти, это намного дешевле группировок и FFT.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(len(df)).encode('utf-8'))
+    for col in columns:
+        values = df[col].to_numpy()
+        digest.update(f"|{col}|{values.dtype}".encode('utf-8'))
+        if values.dtype.kind not in 'biufcmM':
+            # Строки и прочие объекты хэшируем поэлементно средствами pandas
+            values = pd.util.hash_pandas_object(df[col], index=False).to_numpy()
+        digest.update(np.ascontiguousarray(values).view(np.uint8))
+    return digest.hexdigest()
+
+
+def make_key(operation: str, input_fingerprint: str, **params) -> str:
+    """Ключ результата: операция, отпечаток входа и параметры."""
+    text = f"{operation}|{input_fingerprint}|{sorted(params.items(), key=str)!r}"
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def estimate_size(value) -> int:
+    """Оценка занимаемой памяти (байт) для DataFrame, массивов и их словарей/кортежей."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(estimate_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(item) for item in value)
+    return 64
+
+
+class ResultCache:
+    """
+    Кэш результатов обработки по отпечатку содержимого.
+
+    Память — LRU с ограничением по объему; при вытеснении результаты могут
+    сбрасываться на диск (если задан disk_dir) и подниматься обратно при обращении.
+    """
+
+    def __init__(self, max_memory_bytes=512 * 1024 ** 2, disk_dir=None, max_disk_bytes=2 * 1024 ** 3):
+        self.max_memory_bytes = max_memory_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.enabled = True
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Результат по ключу или None."""
+        if not self.enabled:
+            return None
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+        value = self._load_from_disk(key)
+        if value is not None:
+            self.hits += 1
+            self._put_memory(key, value)
+            return value
+
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        if self.enabled:
+            self._put_memory(key, value)
+
+    def get_or_compute(self, key, compute):
+        """Возвращает результат из кэша или вычисляет и сохраняет его."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+        self._memory_bytes = 0
+
+    def _put_memory(self, key, value):
+        size = estimate_size(value)
+        if size > self.max_memory_bytes:
+            # Слишком большой результат держим только на диске
+            self._save_to_disk(key, value)
+            return
+        if key in self._entries:
+            self._memory_bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size)
+        self._memory_bytes += size
+
+        while self._memory_bytes > self.max_memory_bytes and self._entries:
+            old_key, (old_value, old_size) = self._entries.popitem(last=False)
+            self._memory_bytes -= old_size
+            self._save_to_disk(old_key, old_value)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def _save_to_disk(self, key, value):
+        if self.disk_dir is None:
+            return
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            with open(self._disk_path(key), 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            self._evict_disk()
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить результат на диск: {str(e)}")
+
+    def _load_from_disk(self, key):
+        if self.disk_dir is None or not os.path.exists(self._disk_path(key)):
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                value = pickle.load(f)
+            os.utime(self._disk_path(key))
+            return value
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать результат с диска: {str(e)}")
+            return None
+
+    def _evict_disk(self):
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            path = os.path.join(self.disk_dir, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_disk_bytes:
+                break
+            os.remove(path)
+            total_size -= size
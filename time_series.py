@@ -0,0 +1,81 @@
+import re
+import numpy as np
+import pandas as pd
+
+
+class SnapshotSeries:
+    """
+    Набор мгновенных полей на одной сетке.
+
+    data имеет форму (время, точка, переменная), координаты точек хранятся один раз.
+    """
+
+    def __init__(self, times, coords, variables, data, file_paths=None):
+        self.times = np.asarray(times)
+        self.coords = coords  # DataFrame с координатными колонками, по строке на точку
+        self.variables = list(variables)
+        self.data = data
+        self.file_paths = list(file_paths or [])
+
+    @property
+    def n_times(self):
+        return self.data.shape[0]
+
+    @property
+    def n_points(self):
+        return self.data.shape[1]
+
+    def variable(self, name):
+        """Массив (время, точка) для одной переменной без копирования."""
+        return self.data[:, :, self.variables.index(name)]
+
+    def snapshot(self, index):
+        """Отдельный момент времени в виде DataFrame с координатами."""
+        frame = pd.DataFrame(self.data[index], columns=self.variables)
+        return pd.concat([self.coords.reset_index(drop=True), frame], axis=1)
+
+    def time_mean(self):
+        """Осредненное по времени поле (накопление в float64)."""
+        mean = self.data.mean(axis=0, dtype=np.float64)
+        return pd.concat([self.coords.reset_index(drop=True),
+                          pd.DataFrame(mean, columns=self.variables)], axis=1)
+
+    def fluctuations(self):
+        """Пульсации относительно среднего по времени, форма (время, точка, переменная)."""
+        mean = self.data.mean(axis=0, dtype=np.float64).astype(self.data.dtype)
+        return self.data - mean[np.newaxis]
+
+    def time_statistics(self):
+        """
+        Среднее, RMS пульсаций и дисперсия по времени за один проход по массиву.
+
+        :return: DataFrame с координатами и колонками '<var>_mean', '<var>_rms', '<var>_var'.
+        """
+        count = self.n_times
+        # Суммы копятся по отклонениям от первого снимка: E[x²] - E[x]² без сдвига теряет
+        # все значащие разряды, когда среднее велико по сравнению с пульсациями (давление)
+        shift = self.data[0].astype(np.float64)
+        total = np.zeros(self.data.shape[1:], dtype=np.float64)
+        total_sq = np.zeros(self.data.shape[1:], dtype=np.float64)
+        for snapshot in self.data:
+            deviation = snapshot - shift
+            total += deviation
+            total_sq += np.square(deviation)
+        mean_deviation = total / count
+        mean = shift + mean_deviation
+        variance = np.maximum(total_sq / count - mean_deviation ** 2, 0.0)
+
+        result = {}
+        for i, name in enumerate(self.variables):
+            result[f"{name}_mean"] = mean[:, i]
+            result[f"{name}_rms"] = np.sqrt(variance[:, i])
+            result[f"{name}_var"] = variance[:, i]
+        return pd.concat([self.coords.reset_index(drop=True), pd.DataFrame(result)], axis=1)
+
+
+def snapshot_time(file_path, default):
+    """Время снимка из имени файла (последнее число в имени), иначе default."""
+    stem = re.sub(r'\.[^.]+$', '', file_path.replace('\\', '/').rsplit('/', 1)[-1])
+    # Знак допускается только в показателе степени: дефис в 'flow-0001' — разделитель, а не минус
+    numbers = re.findall(r'\d+(?:\.\d+)?(?:[eE][-+]?\d+)?', stem)
+    return float(numbers[-1]) if numbers else float(default)
@@ -1,16 +1,53 @@
 import numpy as np
 import pandas as pd
 from logger import logger
-from scipy.fft import fft, fftfreq
+from math import factorial
+from scipy import sparse
+from scipy.fft import fftfreq, ifft, irfft, next_fast_len, rfft, rfftfreq, rfftn
+from scipy.signal import get_window
+from grid_index import GridIndex
+from result_cache import ResultCache, fingerprint, make_key
 
 class TKE_SpectrumCalculator:
-    def calculate_tke_spectrum(self, data_frame, selected_axis, selected_functions):
+    # Методы оценки спектра
+    METHODS = ('periodogram', 'welch')
+    # Окна для метода Уэлча (имена scipy.signal.get_window)
+    WINDOWS = ('hann', 'hamming', 'boxcar')
+    # Способы обработки неравномерной оси: интерполяция на равномерную сетку или Ломб–Скаргл
+    NONUNIFORM_METHODS = ('resample', 'lombscargle')
+    # Допустимый относительный разброс шага, при котором ось считается равномерной
+    UNIFORM_TOLERANCE = 1e-6
+    # Объем памяти под один пакет сегментов при оценке по Уэлчу
+    WELCH_BATCH_BYTES = 64 * 1024 ** 2
+    # Объем памяти под один пакет функций в быстром методе Ломба–Скаргла
+    LOMB_SCARGLE_BATCH_BYTES = 256 * 1024 ** 2
+
+    def __init__(self, result_cache: ResultCache = None, workers: int = -1):
+        # Спектры по отпечатку оси и выбранных функций
+        self.result_cache = result_cache or ResultCache()
+        # Число потоков scipy.fft (-1 — все ядра)
+        self.workers = workers
+
+    def calculate_tke_spectrum(self, data_frame, selected_axis, selected_functions, method='periodogram',
+                               segment_length=None, overlap=0.5, window='hann', nonuniform='resample'):
         """
         Рассчитывает спектр турбулентной кинетической энергии (ТКЭ) для выбранных функций.
 
+        Все функции обрабатываются одним пакетным вещественным FFT: ось сортируется
+        и проверяется один раз, колонки собираются в двумерный массив.
+
         :param data_frame: DataFrame с исходными данными.
         :param selected_axis: Ось для расчета (например, 'Centroid[X]', 'Centroid[Y]', 'Centroid[Z]').
         :param selected_functions: Список функций для расчета спектра ТКЭ.
+        :param method: 'periodogram' — одна периодограмма по первой половине данных;
+                       'welch' — среднее по перекрывающимся сегментам всей записи с окном.
+        :param segment_length: Длина сегмента для 'welch' (по умолчанию N // 8, не меньше 16 точек).
+        :param overlap: Доля перекрытия соседних сегментов для 'welch' (0 <= overlap < 1).
+        :param window: Окно для 'welch': 'hann', 'hamming' или 'boxcar'.
+        :param nonuniform: Обработка неравномерной оси (сгущенные сетки, объединенные таблицы):
+                           'resample' — линейная интерполяция на равномерную сетку с тем же числом точек;
+                           'lombscargle' — периодограмма Ломба–Скаргла без интерполяции
+                           (только для 'periodogram'). Повторяющиеся координаты усредняются.
         :return: DataFrame с результатами расчета (волновые числа k и спектр энергии E_k).
         """
         try:
@@ -23,55 +60,441 @@ class TKE_SpectrumCalculator:
                 missing_funcs = [func for func in selected_functions if func not in data_frame.columns]
                 raise ValueError(f"Следующие функции отсутствуют в DataFrame: {missing_funcs}")
 
-            # Создаем DataFrame для хранения результатов
-            tke_data = pd.DataFrame()
-
-            # Для каждой выбранной функции рассчитываем спектр
-            for function in selected_functions:
-                logger.info(f"Рассчитываем спектр для функции '{function}' по оси '{selected_axis}'.")
-
-                # Получаем данные для текущей функции
-                r_values = np.sort(data_frame[selected_axis].values)  # пространственная координата
-                R_values = data_frame[function].values  # автокорреляционная функция
-                N = len(r_values)
-                half_N = N //2
-                 # Используем только первую половину данных
-                r_half = r_values[:half_N]
-                R_half = R_values[:half_N]
-
-                if len(r_half) < 2:
-                    raise ValueError("Недостаточно данных после обрезки")
-                
-                delta_r = r_half[1] - r_half[0]
-                print(f"Уникальные по оси '{selected_axis}' = '{r_values}'")
-
-                # Вычисляем волновые числа и спектр энергии
-                
-                # k = 2*np.pi * np.fft.fftfreq(len(r_values), d=delta_r)
-                
-                    # Расчет FFT для усеченных данных
-                k = 2 * np.pi * fftfreq(half_N, d=delta_r)
-                fft_result = fft(R_half)
-                E_k = np.abs(fft_result) ** 2 / (2 * np.pi * half_N) 
-
-                # E_k = np.abs(np.fft.fft(R_values)) ** 2 / (2 * np.pi * len(R_values))
-                # E_k = np.abs(fftfreq(fft(R_values))) ** 2 / (2 * np.pi * len(R_values))
-
-                # Выбираем только положительные волновые числа (кроме нулевого)
-                k_positive = k[k > 0]
-                E_k_positive = E_k[k > 0]
-
-                # Добавляем результаты в DataFrame
-                if len(k_positive) > 0:
-                    k_col_name = f'k_{function}'  # Имя колонки для волновых чисел
-                    E_col_name = f'E_{function}'  # Имя колонки для спектра энергии
-
-                    tke_data[k_col_name] = k_positive
-                    tke_data[E_col_name] = E_k_positive
+            if method not in self.METHODS:
+                raise ValueError(f"Неизвестный метод оценки спектра: {method}")
+            if nonuniform not in self.NONUNIFORM_METHODS:
+                raise ValueError(f"Неизвестный способ обработки неравномерной оси: {nonuniform}")
+
+            key = make_key('tke_spectrum', fingerprint(data_frame, [selected_axis, *selected_functions]),
+                           axis=selected_axis, functions=list(selected_functions), method=method,
+                           segment_length=segment_length, overlap=overlap, window=window,
+                           nonuniform=nonuniform)
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                logger.info("Спектр ТКЭ взят из кэша.")
+                return cached.copy()
+
+            logger.info(f"Рассчитываем спектр для {len(selected_functions)} функций по оси '{selected_axis}'.")
+            r_values, R_values = self._prepare_samples(data_frame, selected_axis, selected_functions,
+                                                       half=(method == 'periodogram'))
+            uniform = self._is_uniform(r_values)
+            if not uniform:
+                r_values, R_values = self._merge_duplicates(r_values, R_values)
+                if nonuniform == 'lombscargle' and method == 'welch':
+                    raise ValueError("Метод Уэлча требует равномерной оси: используйте интерполяцию")
+                logger.info(f"Ось '{selected_axis}' неравномерная, способ обработки: {nonuniform}")
+
+            if not uniform and nonuniform == 'lombscargle':
+                k, E_k = self._lomb_scargle(r_values, R_values)
+            else:
+                if not uniform:
+                    r_values, R_values = self._resample_uniform(r_values, R_values)
+                if method == 'welch':
+                    k, E_k = self._welch(r_values, R_values, segment_length, overlap, window)
+                else:
+                    k, E_k = self._periodogram(r_values, R_values)
+            tke_data = self._spectrum_frame(k, E_k, selected_functions)
 
+            self.result_cache.put(key, tke_data.copy())
             logger.info("Расчет спектра ТКЭ успешно завершен.")
             return tke_data
 
         except Exception as e:
             logger.error(f"Ошибка при расчете спектра ТКЭ: {str(e)}")
             raise
+
+    def calculate_3d_spectrum(self, data_frame, velocity_columns, coordinate_columns=GridIndex.AXES,
+                              viscosity=1.0, decimals=None):
+        """
+        Трехмерный спектр энергии E(|k|), осредненный по сферическим оболочкам.
+
+        Поля скорости переводятся из плоской таблицы в массивы (nx, ny, nz) через индекс
+        сетки, пульсации получаются вычитанием среднего. Каждая компонента проходит через
+        многопоточный rfftn по очереди (вход перезаписывается), энергия мод накапливается
+        в одном массиве и раскладывается по оболочкам |k| одним np.bincount.
+
+        Нормировка: сумма E(k)·dk равна кинетической энергии пульсаций 0.5·<u_i u_i>.
+        Сетка считается равномерной и периодической; оболочки с |k| больше наименьшей
+        частоты Найквиста заполнены не полностью.
+
+        :param velocity_columns: Колонки компонент скорости (например, U, V, W).
+        :param coordinate_columns: Координатные колонки сетки.
+        :param viscosity: Кинематическая вязкость ν для спектра диссипации D(k) = 2ν k² E(k).
+        :param decimals: Округление координат при построении индекса сетки.
+        :return: DataFrame с колонками 'k', 'E', 'D' и 'modes' (число мод в оболочке).
+        """
+        try:
+            velocity_columns = list(velocity_columns)
+            if not velocity_columns:
+                raise ValueError("Выберите хотя бы одну компоненту скорости")
+            missing = [col for col in velocity_columns if col not in data_frame.columns]
+            if missing:
+                raise ValueError(f"Следующие колонки отсутствуют в DataFrame: {missing}")
+
+            key = make_key('spectrum_3d', fingerprint(data_frame, [*coordinate_columns, *velocity_columns]),
+                           velocity=velocity_columns, coordinates=list(coordinate_columns),
+                           viscosity=viscosity, decimals=decimals)
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                logger.info("Трехмерный спектр взят из кэша.")
+                return cached.copy()
+
+            grid = GridIndex.from_frame(data_frame, coordinate_columns, decimals)
+            spacing = [self._grid_step(axis, name) for axis, name in zip(grid.coordinates, coordinate_columns)]
+            shape = grid.shape
+            n_points = grid.n_cells
+
+            # Энергия мод (половина спектра по последней оси), накопленная по компонентам
+            energy = np.zeros(shape[:-1] + (shape[-1] // 2 + 1,))
+            for col in velocity_columns:
+                field = grid.field(data_frame, col).astype(np.float64)  # копия: исходная таблица не меняется
+                field -= field.mean()
+                modes = rfftn(field, workers=self.workers, overwrite_x=True)
+                del field
+                energy += modes.real ** 2
+                energy += modes.imag ** 2
+                del modes
+
+            # Моды с 0 < kz < kz_Найквиста присутствуют в rfftn один раз вместо двух
+            multiplicity = np.full(energy.shape[-1], 2.0)
+            multiplicity[0] = 1.0
+            if shape[-1] % 2 == 0:
+                multiplicity[-1] = 1.0
+            energy *= multiplicity
+            energy *= 0.5 / n_points ** 2
+
+            k_axes = [2 * np.pi * fftfreq(n, d) for n, d in zip(shape[:-1], spacing[:-1])]
+            k_axes.append(2 * np.pi * rfftfreq(shape[-1], spacing[-1]))
+            dk = min(2 * np.pi / (n * d) for n, d in zip(shape, spacing))
+            k_squared = np.zeros(energy.shape)
+            for i, k_axis in enumerate(k_axes):
+                k_squared += (k_axis ** 2).reshape([-1 if j == i else 1 for j in range(len(shape))])
+            shells = np.rint(np.sqrt(k_squared, out=k_squared) / dk).astype(np.int64).ravel()
+            del k_squared
+
+            E_shell = np.bincount(shells, weights=energy.ravel()) / dk
+            n_modes = np.bincount(shells, weights=np.broadcast_to(multiplicity, energy.shape).ravel())
+            k = dk * np.arange(len(E_shell))
+
+            result = pd.DataFrame({'k': k, 'E': E_shell, 'D': 2 * viscosity * k ** 2 * E_shell,
+                                   'modes': n_modes}).iloc[1:].reset_index(drop=True)
+            self.result_cache.put(key, result.copy())
+            logger.info(f"Трехмерный спектр рассчитан: сетка {shape}, оболочек {len(result)}")
+            return result
+
+        except Exception as e:
+            logger.error(f"Ошибка при расчете трехмерного спектра: {str(e)}")
+            raise
+
+    def calculate_autocorrelation(self, data_frame, selected_axis, selected_functions, normalize=True,
+                                  max_lag=None):
+        """
+        Автокорреляция R(r) пульсаций выбранных функций вдоль оси по теореме Винера–Хинчина.
+
+        Вместо перебора сдвигов (O(N²)) все функции одним пакетом проходят через
+        вещественный FFT длиной next_fast_len(2N - 1) (дополнение нулями исключает
+        циклическое наложение), квадрат модуля спектра возвращается обратным FFT.
+        Ось сортируется, повторяющиеся координаты усредняются, неравномерная ось
+        интерполируется на равномерную сетку. Оценка смещенная (деление на N):
+        она положительно определена и дает неотрицательный спектр.
+
+        :param data_frame: DataFrame с исходными полями (скорость, температура и т.п.).
+        :param selected_axis: Ось, вдоль которой берутся сдвиги.
+        :param selected_functions: Колонки, для которых считается автокорреляция.
+        :param normalize: Нормировать на дисперсию (R(0) = 1).
+        :param max_lag: Наибольший сдвиг в точках (по умолчанию N - 1).
+        :return: DataFrame с колонкой сдвига 'r_<ось>' и колонками 'R_<функция>'.
+        """
+        try:
+            if data_frame is None or data_frame.empty:
+                raise ValueError("DataFrame пуст или не загружен.")
+            if selected_axis not in data_frame.columns:
+                raise ValueError(f"Выбранная ось '{selected_axis}' отсутствует в DataFrame.")
+            missing_funcs = [func for func in selected_functions if func not in data_frame.columns]
+            if missing_funcs:
+                raise ValueError(f"Следующие функции отсутствуют в DataFrame: {missing_funcs}")
+            if not selected_functions:
+                raise ValueError("Выберите хотя бы одну функцию")
+
+            key = make_key('autocorrelation', fingerprint(data_frame, [selected_axis, *selected_functions]),
+                           axis=selected_axis, functions=list(selected_functions), normalize=normalize,
+                           max_lag=max_lag)
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                logger.info("Автокорреляция взята из кэша.")
+                return cached.copy()
+
+            r_values, values = self._prepare_samples(data_frame, selected_axis, selected_functions, half=False)
+            if not self._is_uniform(r_values):
+                r_values, values = self._merge_duplicates(r_values, values)
+                r_values, values = self._resample_uniform(r_values, values)
+                logger.info(f"Ось '{selected_axis}' неравномерная: значения интерполированы на равномерную сетку")
+            if not np.isfinite(values).all():
+                raise ValueError("Выбранные функции содержат пропуски")
+
+            n_samples = len(r_values)
+            n_lags = n_samples if max_lag is None else min(int(max_lag) + 1, n_samples)
+            if n_lags < 2:
+                raise ValueError("Наибольший сдвиг должен быть не меньше 1")
+
+            fluctuations = values - values.mean(axis=0)
+            n_fft = next_fast_len(2 * n_samples - 1, real=True)
+            spectrum = rfft(fluctuations, n=n_fft, axis=0, workers=self.workers)
+            del fluctuations
+            power = spectrum.real ** 2
+            power += spectrum.imag ** 2
+            del spectrum
+            R_values = irfft(power, n=n_fft, axis=0, workers=self.workers)[:n_lags] / n_samples
+
+            if normalize:
+                variance = R_values[0].copy()
+                variance[variance == 0] = np.nan  # Постоянная функция: корреляция не определена
+                R_values /= variance
+
+            delta_r = (r_values[-1] - r_values[0]) / (n_samples - 1)
+            result = pd.DataFrame({f'R_{function}': R_values[:, i] for i, function in enumerate(selected_functions)})
+            result.insert(0, f'r_{selected_axis}', delta_r * np.arange(n_lags))
+
+            self.result_cache.put(key, result.copy())
+            logger.info(f"Автокорреляция рассчитана: функций {len(selected_functions)}, сдвигов {n_lags}, "
+                        f"длина FFT {n_fft}")
+            return result
+
+        except Exception as e:
+            logger.error(f"Ошибка при расчете автокорреляции: {str(e)}")
+            raise
+
+    def calculate_tke_spectrum_from_fields(self, data_frame, selected_axis, selected_functions, normalize=True,
+                                           max_lag=None, **spectrum_options):
+        """
+        Спектр ТКЭ напрямую из исходных полей: автокорреляция по FFT и спектр по ней.
+
+        :param spectrum_options: Параметры calculate_tke_spectrum (method, window и т.д.).
+        :return: (автокорреляция, спектр) — два DataFrame.
+        """
+        autocorrelation = self.calculate_autocorrelation(data_frame, selected_axis, selected_functions,
+                                                         normalize=normalize, max_lag=max_lag)
+        lag_column, *R_columns = autocorrelation.columns
+        spectrum = self.calculate_tke_spectrum(autocorrelation, lag_column, R_columns, **spectrum_options)
+        return autocorrelation, spectrum
+
+    def _grid_step(self, coordinates, name):
+        """Шаг равномерной сетки по оси (ошибка, если шаг меняется)."""
+        if len(coordinates) < 2:
+            raise ValueError(f"По оси '{name}' меньше двух узлов")
+        if not self._is_uniform(coordinates):
+            raise ValueError(f"Сетка по оси '{name}' неравномерная: трехмерный спектр требует равномерной сетки")
+        return (coordinates[-1] - coordinates[0]) / (len(coordinates) - 1)
+
+    def _prepare_samples(self, data_frame, selected_axis, selected_functions, half=True):
+        """
+        Сортирует ось один раз и собирает функции в массив (точка, функция).
+
+        :param half: Взять только первую половину данных (автокорреляция симметрична).
+        """
+        r_values = data_frame[selected_axis].to_numpy(dtype=np.float64)
+        order = np.argsort(r_values, kind='stable')
+        half_N = len(r_values) // 2 if half else len(r_values)
+        if half_N < 2:
+            raise ValueError("Недостаточно данных после обрезки")
+
+        rows = order[:half_N]
+        r_half = r_values[rows]
+        R_half = data_frame[list(selected_functions)].to_numpy(dtype=np.float64)[rows]
+        if not np.isfinite(r_half).all():
+            raise ValueError(f"Ось '{selected_axis}' содержит пропуски")
+        return r_half, R_half
+
+    def _is_uniform(self, r_values):
+        """Равномерна ли отсортированная ось (разброс шага в пределах UNIFORM_TOLERANCE)."""
+        steps = np.diff(r_values)
+        mean_step = (r_values[-1] - r_values[0]) / (len(r_values) - 1)
+        return mean_step > 0 and np.ptp(steps) <= self.UNIFORM_TOLERANCE * mean_step
+
+    def _merge_duplicates(self, r_values, R_values):
+        """Усредняет значения в повторяющихся координатах отсортированной оси."""
+        starts = np.flatnonzero(np.concatenate([[True], np.diff(r_values) > 0]))
+        if len(starts) == len(r_values):
+            return r_values, R_values
+        if len(starts) < 4:
+            raise ValueError("Недостаточно различных координат по оси")
+        counts = np.diff(np.append(starts, len(r_values)))
+        return r_values[starts], np.add.reduceat(R_values, starts, axis=0) / counts[:, np.newaxis]
+
+    def _resample_uniform(self, r_values, R_values):
+        """
+        Линейная интерполяция всех функций на равномерную сетку с тем же числом точек.
+
+        Номера соседних узлов и веса считаются один раз и применяются ко всем колонкам.
+        """
+        grid = np.linspace(r_values[0], r_values[-1], len(r_values))
+        right = np.clip(np.searchsorted(r_values, grid, side='right'), 1, len(r_values) - 1)
+        left = right - 1
+        weight = ((grid - r_values[left]) / (r_values[right] - r_values[left]))[:, np.newaxis]
+        return grid, R_values[left] * (1 - weight) + R_values[right] * weight
+
+    def _lomb_scargle(self, r_values, R_values, oversampling=16, order=6):
+        """
+        Периодограмма Ломба–Скаргла для неравномерной оси (быстрый метод Пресса–Рыбицки).
+
+        Значения переносятся (экстраполяция Лагранжа порядка order) на равномерную сетку
+        длины 2^m, после чего тригонометрические суммы для всех частот получаются одним FFT.
+        Сетка берется не короче oversampling·n_freq узлов (у Пресса–Рыбицки MACC·2·ofac):
+        при более грубой сетке перенос искажает суммы на частотах 2ω в верхней половине
+        спектра. По умолчанию (16, 6) отличие от scipy.signal.lombscargle во всем
+        диапазоне k — не больше 4e-4 относительных.
+        Матрица переноса строится один раз и применяется ко всем функциям сразу.
+        Частоты совпадают с сеткой периодограммы для того же числа точек, нормировка —
+        с E_k = |FFT|² / (2π N) на равномерной оси.
+
+        :return: Положительные волновые числа k и массив E_k формы (k, функция).
+        """
+        n_samples, n_functions = R_values.shape
+        n_freq = (n_samples - 1) // 2
+        if n_freq < 1:
+            raise ValueError("Недостаточно данных для метода Ломба–Скаргла")
+        mean_step = (r_values[-1] - r_values[0]) / (n_samples - 1)
+        df = 1.0 / (n_samples * mean_step)
+        n_fft = 1 << int(np.ceil(np.log2((n_freq + 1) * oversampling)))
+
+        # Слагаемые, не зависящие от функций (частоты 2f)
+        S2, C2 = self._trig_sums(r_values, np.full((n_samples, 1), 1.0 / n_samples), 2 * df, n_freq + 1, n_fft, order)
+        S2, C2 = S2[1:], C2[1:]
+        tan_2wt = S2 / C2
+        C2w = 1 / np.sqrt(1 + tan_2wt ** 2)
+        S2w = tan_2wt * C2w
+        Cw = np.sqrt(0.5 * (1 + C2w))
+        Sw = np.sign(S2w) * np.sqrt(0.5 * (1 - C2w))
+        CC = 0.5 * (1 + C2 * C2w + S2 * S2w)
+        SS = 0.5 * (1 - C2 * C2w - S2 * S2w)
+
+        centered = R_values - R_values.mean(axis=0)
+        batch = max(1, self.LOMB_SCARGLE_BATCH_BYTES // (n_fft * 16))
+        E_k = np.empty((n_freq, n_functions))
+        for first in range(0, n_functions, batch):
+            Sh, Ch = self._trig_sums(r_values, centered[:, first:first + batch] / n_samples, df, n_freq + 1,
+                                     n_fft, order)
+            Sh, Ch = Sh[1:], Ch[1:]
+            YC = Ch * Cw + Sh * Sw
+            YS = Sh * Cw - Ch * Sw
+            # Нормировка 'psd' (0.5 N) и множитель 1/(2π), как у периодограммы
+            E_k[:, first:first + batch] = (YC ** 2 / CC + YS ** 2 / SS) * 0.5 * n_samples / (2 * np.pi)
+
+        k = 2 * np.pi * df * np.arange(1, n_freq + 1)
+        logger.info(f"Периодограмма Ломба–Скаргла: точек {n_samples}, частот {n_freq}")
+        return k, E_k
+
+    def _trig_sums(self, t, h, df, n_freq, n_fft, order):
+        """
+        Суммы S_j = Σ h·sin(2π j df t) и C_j = Σ h·cos(2π j df t) для j = 0..n_freq-1.
+
+        :param h: Массив (точка, колонка) — все колонки обрабатываются одним FFT.
+        """
+        t0 = t[0]
+        tnorm = ((t - t0) * n_fft * df) % n_fft
+        grid = self._extirpolation_matrix(tnorm, n_fft, order) @ h
+        fft_grid = ifft(grid, axis=0, workers=self.workers)[:n_freq]
+        if t0 != 0:
+            fft_grid *= np.exp(2j * np.pi * t0 * df * np.arange(n_freq))[:, np.newaxis]
+        return n_fft * fft_grid.imag, n_fft * fft_grid.real
+
+    def _extirpolation_matrix(self, x, n_grid, order):
+        """Разреженная матрица (n_grid, len(x)) переноса значений из точек x в узлы сетки."""
+        integer = x == np.floor(x)
+        x_safe = np.where(integer, x + 0.5, x)  # точные узлы обрабатываются отдельно
+        # Сетка периодична (суммы берутся на целых частотах), поэтому узлы у краев
+        # переносятся циклически, а не прижимаются к краю
+        low = np.floor(x_safe).astype(np.int64) - (order - 1) // 2
+        offsets = np.arange(order)[:, np.newaxis]
+        numerator = np.prod(x_safe - low - offsets, axis=0)
+
+        rows = np.empty((order, len(x)), dtype=np.int64)
+        values = np.empty((order, len(x)))
+        denominator = float(factorial(order - 1))
+        for j in range(order):
+            if j > 0:
+                denominator *= j / (j - order)
+            rows[j] = low + (order - 1 - j)
+            values[j] = numerator / (denominator * (x_safe - rows[j]))
+
+        # Точка в узле сетки переносится в этот узел целиком
+        rows[:, integer] = x[integer].astype(np.int64)
+        values[:, integer] = 0.0
+        values[0, integer] = 1.0
+        rows %= n_grid
+
+        columns = np.broadcast_to(np.arange(len(x)), (order, len(x)))
+        return sparse.csr_matrix((values.ravel(), (rows.ravel(), columns.ravel())), shape=(n_grid, len(x)))
+
+    def _periodogram(self, r_half, R_half):
+        """
+        Периодограмма всех функций одним вещественным FFT вдоль оси.
+
+        :return: Положительные волновые числа k и массив E_k формы (k, функция).
+        """
+        half_N = len(r_half)
+        delta_r = r_half[1] - r_half[0]
+        if delta_r <= 0:
+            raise ValueError("Шаг по оси должен быть положительным (повторяющиеся координаты?)")
+
+        fft_result = rfft(R_half, axis=0, workers=self.workers)
+        E_k = np.abs(fft_result) ** 2 / (2 * np.pi * half_N)
+        k = 2 * np.pi * rfftfreq(half_N, d=delta_r)
+
+        # Только положительные волновые числа (без нулевого и, как у fftfreq, без частоты Найквиста)
+        n_positive = (half_N - 1) // 2
+        return k[1:n_positive + 1], E_k[1:n_positive + 1]
+
+    def _welch(self, r_values, R_values, segment_length=None, overlap=0.5, window='hann'):
+        """
+        Оценка спектра по Уэлчу: среднее периодограмм перекрывающихся сегментов с окном.
+
+        Сегменты берутся представлением без копирования (sliding_window_view) и
+        обрабатываются пакетами ограниченного объема, поэтому память не растет с длиной
+        записи. Спектр каждого сегмента нормируется на энергию окна, среднее сегмента
+        вычитается.
+
+        :return: Положительные волновые числа k и массив E_k формы (k, функция).
+        """
+        n_samples, n_functions = R_values.shape
+        if window not in self.WINDOWS:
+            raise ValueError(f"Неизвестное окно: {window}")
+        if not 0 <= overlap < 1:
+            raise ValueError("Перекрытие сегментов должно быть в диапазоне [0, 1)")
+        segment_length = int(segment_length or max(16, n_samples // 8))
+        if segment_length < 4 or segment_length > n_samples:
+            raise ValueError(f"Длина сегмента должна быть от 4 до {n_samples} точек")
+
+        delta_r = r_values[1] - r_values[0]
+        if delta_r <= 0:
+            raise ValueError("Шаг по оси должен быть положительным (повторяющиеся координаты?)")
+
+        step = max(1, int(round(segment_length * (1 - overlap))))
+        starts = np.arange(0, n_samples - segment_length + 1, step)
+        taper = get_window(window, segment_length)[:, np.newaxis]
+        # Сегменты как представление (сегмент, функция, точка) без копирования данных
+        segments = np.lib.stride_tricks.sliding_window_view(R_values, segment_length, axis=0)[::step]
+
+        batch = max(1, self.WELCH_BATCH_BYTES // (segment_length * n_functions * 16))
+        power = np.zeros((segment_length // 2 + 1, n_functions))
+        for first in range(0, len(starts), batch):
+            block = np.moveaxis(segments[first:first + batch], -1, 1)  # (сегмент, точка, функция)
+            block = block - block.mean(axis=1, keepdims=True)
+            block *= taper
+            power += (np.abs(rfft(block, axis=1, workers=self.workers)) ** 2).sum(axis=0)
+
+        E_k = power / (len(starts) * 2 * np.pi * np.sum(taper ** 2))
+        k = 2 * np.pi * rfftfreq(segment_length, d=delta_r)
+        n_positive = (segment_length - 1) // 2
+        logger.info(f"Оценка по Уэлчу: сегментов {len(starts)}, длина {segment_length}, окно '{window}'")
+        return k[1:n_positive + 1], E_k[1:n_positive + 1]
+
+    def _spectrum_frame(self, k, E_k, selected_functions):
+        """Колонки k_<функция> и E_<функция> для каждой функции."""
+        if len(k) == 0:
+            return pd.DataFrame()
+        columns = {}
+        for i, function in enumerate(selected_functions):
+            columns[f'k_{function}'] = k
+            columns[f'E_{function}'] = E_k[:, i]
+        return pd.DataFrame(columns)
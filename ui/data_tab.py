@@ -1,9 +1,11 @@
 import tkinter as tk
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-from tkinter import messagebox
+from tkinter import filedialog, messagebox
 import pandas as pd
 from logger import logger
+from lazy_frame import LazyFrame
+from processing_pipeline import ProcessingPipeline
 
 class DataTab(ttk.Frame):
     def __init__(self, parent, controller):
@@ -22,6 +24,14 @@ class DataTab(ttk.Frame):
         ttk.Button(button_frame, text='Загрузить CSV', command=self.controller.load_csv).pack(side=LEFT, padx=5)
         ttk.Button(button_frame, text='Загрузить XLSX', command=self.controller.load_xlsx).pack(side=LEFT, padx=5)
 
+        # Выбор активного набора данных
+        ttk.Label(button_frame, text="Набор данных:").pack(side=LEFT, padx=5)
+        self.dataset_var = ttk.StringVar()
+        self.dataset_menu = ttk.Combobox(button_frame, textvariable=self.dataset_var, state='readonly', width=30)
+        self.dataset_menu.pack(side=LEFT, padx=5)
+        self.dataset_menu.bind('<<ComboboxSelected>>',
+                               lambda e: self.controller.select_dataset(self.dataset_var.get()))
+
         # Таблица предпросмотра
         self.preview_tree = ttk.Treeview(load_frame, show='headings')
         self.preview_tree.pack(fill=BOTH, expand=YES, padx=10, pady=10)
@@ -50,6 +60,16 @@ class DataTab(ttk.Frame):
         ttk.Button(processing_frame, text='Агрегировать данные', 
                  command=self.open_aggregation_window).grid(row=0, column=2, padx=5)
 
+        # План обработки (запись и повтор операций)
+        ttk.Button(processing_frame, text='План обработки',
+                 command=self.open_pipeline_window).grid(row=0, column=3, padx=5)
+
+        # Отмена и повтор операций
+        ttk.Button(processing_frame, text='Отменить',
+                 command=self.controller.undo).grid(row=0, column=4, padx=5)
+        ttk.Button(processing_frame, text='Повторить',
+                 command=self.controller.redo).grid(row=0, column=5, padx=5)
+
     # --- Основные методы обработки ---
     def open_rounding_window(self):
         if self.controller.data_frame is None:
@@ -73,9 +93,16 @@ class DataTab(ttk.Frame):
         decimals_entry = ttk.Entry(window)
         decimals_entry.pack()
 
+        # Квантование координат: сортировка и группировка по целочисленным ключам
+        quantize_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(window, text="Целочисленные ключи координат", variable=quantize_var).pack(pady=5)
+
         # --- Функция apply_rounding с доступом к self ---
         def apply_rounding():
             nonlocal rounding_vars, decimals_entry
+            # Ленивая таблица загружается в фоне, после чего округление запускается повторно
+            if self.controller.materialize_in_background(apply_rounding):
+                return
             try:
                 selected = [col for col, var in rounding_vars.items() if var.get()]
                 decimals = int(decimals_entry.get())
@@ -89,12 +116,14 @@ class DataTab(ttk.Frame):
                 if missing:
                     raise ValueError(f"Для сортировки нужны колонки: {', '.join(missing)}")
 
-                # Округление и сортировка
-                self.controller.data_frame = self.controller.data_processor.round_columns(
-                    self.controller.data_frame, 
+                # Округление и сортировка (на поверхностной копии: исходная таблица остается для отмены)
+                self.controller.apply_data(self.controller.data_processor.round_columns(
+                    self.controller.data_frame.copy(deep=False),
                     selected, 
-                    decimals
-                )
+                    decimals,
+                    quantize=quantize_var.get()
+                ), f"округление {selected} до {decimals} знаков")
+                self.controller.pipeline.round_columns(selected, decimals, quantize_var.get())
                 
                 # Обновление интерфейса
                 self.update_preview()
@@ -137,6 +166,16 @@ class DataTab(ttk.Frame):
                                values=list(self.controller.data_frame.columns))
         axis_menu.pack()
 
+        # Осреднение сразу по нескольким осям (вместо группировки по одной колонке)
+        ttk.Label(window, text="Или осреднить по осям:").pack()
+        average_axes_frame = ttk.Frame(window)
+        average_axes_frame.pack()
+        average_axis_vars = {}
+        for axis in ['X (m)', 'Y (m)', 'Z (m)']:
+            var = tk.BooleanVar()
+            ttk.Checkbutton(average_axes_frame, text=axis, variable=var).pack(side=LEFT, padx=5)
+            average_axis_vars[axis] = var
+
         # Выбор функций
         ttk.Label(window, text="Колонки для усреднения:").pack()
         target_vars = {}
@@ -148,20 +187,37 @@ class DataTab(ttk.Frame):
         def apply_aggregation():
             try:
                 axis = axis_var.get()
+                average_axes = [name for name, var in average_axis_vars.items() if var.get()]
                 targets = [col for col, var in target_vars.items() if var.get()]
                 
-                if not axis or not targets:
+                if (not axis and not average_axes) or not targets:
                     raise ValueError("Выберите ось и минимум одну колонку")
                 
-                result = self.controller.data_processor.aggregate_data(
-                    self.controller.data_frame,
-                    axis,
-                    targets
-                )
+                data = self.controller.data_frame
+                if isinstance(data, LazyFrame):
+                    # Подгружаем только колонки, нужные для агрегации
+                    keys = ['X (m)', 'Y (m)', 'Z (m)'] if average_axes else [axis]
+                    needed = [col for col in dict.fromkeys([*keys, *targets, 'weight']) if col in data.columns]
+                    data = data.project(needed)
+
+                if average_axes:
+                    result = self.controller.data_processor.average_over_axes(data, average_axes, targets)
+                    description = f"осреднение по {average_axes}"
+                else:
+                    result = self.controller.data_processor.aggregate_data(
+                        data,
+                        axis,
+                        targets
+                    )
+                    description = f"группировка по {axis}"
                 
                 # Обновляем данные
-                self.controller.data_frame = result
-                logger.info(f"Агрегация по {axis}: {targets}")
+                self.controller.apply_data(result, f"агрегация ({description})")
+                if average_axes:
+                    self.controller.pipeline.average(average_axes, targets)
+                else:
+                    self.controller.pipeline.aggregate(axis, targets)
+                logger.info(f"Агрегация ({description}): {targets}")
                 self.update_preview()
                 self.controller.update_plot_tab()
                 window.destroy()
@@ -172,7 +228,74 @@ class DataTab(ttk.Frame):
 
         ttk.Button(window, text="Применить", command=apply_aggregation).pack(pady=10)
 
+    def open_pipeline_window(self):
+        """Окно плана обработки: просмотр, повтор на текущих данных, сохранение и загрузка"""
+        window = tk.Toplevel(self)
+        window.title('План обработки')
+
+        plan_text = ttk.Text(window, height=12, width=80)
+        plan_text.pack(fill=BOTH, expand=YES, padx=10, pady=10)
+
+        def refresh():
+            plan_text.delete('1.0', tk.END)
+            plan_text.insert('1.0', self.controller.pipeline.describe())
+
+        def apply_plan():
+            if self.controller.data_frame is None:
+                messagebox.showwarning('Ошибка', 'Сначала загрузите данные!')
+                return
+            if not len(self.controller.pipeline):
+                messagebox.showwarning('Ошибка', 'План пуст')
+                return
+            if self.controller.materialize_in_background(apply_plan):
+                return
+            try:
+                self.controller.apply_data(self.controller.pipeline.execute(
+                    self.controller.data_frame, self.controller.data_processor
+                ), "план обработки")
+                self.update_preview()
+                self.controller.update_plot_tab()
+                messagebox.showinfo("Успех", "План обработки выполнен!")
+            except Exception as e:
+                logger.error(f"Ошибка выполнения плана: {str(e)}")
+                messagebox.showerror("Ошибка", str(e))
+
+        def save_plan():
+            file_path = filedialog.asksaveasfilename(defaultextension='.json',
+                                                     filetypes=[('JSON files', '*.json')])
+            if file_path:
+                self.controller.pipeline.save(file_path)
+                logger.info(f"План обработки сохранен: {file_path}")
+
+        def load_plan():
+            file_path = filedialog.askopenfilename(filetypes=[('JSON files', '*.json')])
+            if file_path:
+                try:
+                    self.controller.set_pipeline(ProcessingPipeline.load(file_path))
+                    refresh()
+                except Exception as e:
+                    messagebox.showerror("Ошибка", f"Не удалось загрузить план: {str(e)}")
+
+        def clear_plan():
+            self.controller.set_pipeline(ProcessingPipeline())
+            refresh()
+
+        button_frame = ttk.Frame(window)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="Применить к текущим данным", command=apply_plan).pack(side=LEFT, padx=5)
+        ttk.Button(button_frame, text="Сохранить", command=save_plan).pack(side=LEFT, padx=5)
+        ttk.Button(button_frame, text="Загрузить", command=load_plan).pack(side=LEFT, padx=5)
+        ttk.Button(button_frame, text="Очистить", command=clear_plan).pack(side=LEFT, padx=5)
+        refresh()
+
     # --- Вспомогательные методы ---
+    def update_dataset_menu(self):
+        """Обновление списка загруженных наборов данных"""
+        names = list(self.controller.datasets)
+        self.dataset_menu['values'] = names
+        active = self.controller.active_dataset
+        self.dataset_var.set(active if active in self.controller.datasets else '')
+
     def update_preview(self):
         """Обновление предпросмотра данных"""
         self.preview_tree.delete(*self.preview_tree.get_children())
@@ -205,7 +328,11 @@ class DataTab(ttk.Frame):
         has_walls_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(window, text="Есть значения на стенках", variable=has_walls_var).pack(pady=5)
 
-        # Поля для ввода координат стенок
+        # Автоматическое определение стенок по крайним координатам
+        auto_walls_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(window, text="Определить стенки автоматически", variable=auto_walls_var).pack(pady=5)
+
+        # Поля для ввода координат стенок (пустое поле — стенок по оси нет)
         ttk.Label(window, text="X (через ;):").pack()
         x_entry = ttk.Entry(window)
         x_entry.pack()
@@ -218,32 +345,47 @@ class DataTab(ttk.Frame):
         z_entry = ttk.Entry(window)
         z_entry.pack()
 
+        ttk.Label(window, text="Допуск (пусто — по умолчанию):").pack()
+        tolerance_entry = ttk.Entry(window)
+        tolerance_entry.pack()
+
+        # Метод расчета размеров ячеек
+        faces_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(window, text="Неравномерная сетка (размеры по граням)", variable=faces_var).pack(pady=5)
+
         def apply_filter():
             if not has_walls_var.get():
                 window.destroy()
                 return
+            if self.controller.materialize_in_background(apply_filter):
+                return
+            method = "faces" if faces_var.get() else "centers"
 
             try:
                 # Парсинг координат стенок
-                walls = {
-                    'x': [float(v.strip()) for v in x_entry.get().split(';')],
-                    'y': [float(v.strip()) for v in y_entry.get().split(';')],
-                    'z': [float(v.strip()) for v in z_entry.get().split(';')]
-                }
+                if auto_walls_var.get():
+                    walls = None
+                else:
+                    walls = {
+                        axis: [float(v.strip()) for v in entry.get().split(';') if v.strip()]
+                        for axis, entry in (('x', x_entry), ('y', y_entry), ('z', z_entry))
+                    }
+                tolerance = float(tolerance_entry.get()) if tolerance_entry.get().strip() else None
                 
                 # Фильтрация данных
-                self.controller.data_frame = self.controller.data_processor.filter_wall_values(
-                    self.controller.data_frame, walls
+                filtered = self.controller.data_processor.filter_wall_values(
+                    self.controller.data_frame, walls, tolerance
                 )
                 
                 # Проверка наличия данных после фильтрации
-                if self.controller.data_frame.empty:
+                if filtered.empty:
                     raise ValueError("Нет данных для расчета после удаления стенок!")
                 
-                # Расчет размеров ячеек
-                self.controller.data_frame = self.controller.data_processor.calculate_cell_sizes(
-                    self.controller.data_frame
-                )
+                # Расчет размеров ячеек (на поверхностной копии: исходная таблица остается для отмены)
+                self.controller.apply_data(self.controller.data_processor.calculate_cell_sizes(
+                    filtered.copy(deep=False), method=method
+                ), "удаление стенок и расчет ячеек")
+                self.controller.pipeline.filter_walls(walls, tolerance).calculate_cell_sizes(method)
                 
                 # Обновление интерфейса
                 self.update_preview()
@@ -4,6 +4,9 @@ from ttkbootstrap.constants import *
 from tkinter import messagebox
 import logging
 import pandas as pd
+from lazy_frame import LazyFrame
+from tke_spectrum_calculator import TKE_SpectrumCalculator
+from grid_index import GridIndex
 
 # Инициализация логгера
 logger = logging.getLogger('DataAnalyzer')
@@ -33,6 +36,12 @@ class TkeTab(ttk.Frame):
         # Кнопка "Получить спектр ТКЭ"
         ttk.Button(button_frame, text="Получить спектр ТКЭ", command=self.calculate_tke_spectrum).pack(side=LEFT, padx=5)
 
+        # Кнопка "Автокорреляция по полям (FFT)"
+        ttk.Button(button_frame, text="Автокорреляция по полям", command=self.calculate_autocorrelation).pack(side=LEFT, padx=5)
+
+        # Кнопка "Трехмерный спектр E(k)"
+        ttk.Button(button_frame, text="Трехмерный спектр E(k)", command=self.calculate_3d_spectrum).pack(side=LEFT, padx=5)
+
     # def open_filter_window(self):
     #     """
     #     Открытие окна фильтрации (аналогично DataTab).
@@ -63,7 +72,7 @@ class TkeTab(ttk.Frame):
             # Создаем окно для выбора параметров расчета спектра ТКЭ
             tke_window = ttk.Toplevel(self)
             tke_window.title('Настройки расчета спектра ТКЭ')
-            tke_window.geometry('600x550')
+            tke_window.geometry('600x700')
 
             # Фрейм для выбора оси
             axis_frame = ttk.LabelFrame(tke_window, text="Выбор оси для расчета")
@@ -111,6 +120,36 @@ class TkeTab(ttk.Frame):
                 function_vars[col] = var
                 ttk.Checkbutton(scrollable_frame, text=col, variable=var).pack(anchor=W, padx=5, pady=2)
 
+            # Фрейм для выбора метода оценки спектра
+            method_frame = ttk.LabelFrame(tke_window, text="Метод оценки спектра")
+            method_frame.pack(fill=X, padx=10, pady=10)
+
+            methods = {'Периодограмма': 'periodogram', 'Уэлч (сегменты с окном)': 'welch'}
+            method_var = ttk.StringVar(value='Периодограмма')
+            ttk.Combobox(method_frame, textvariable=method_var, values=list(methods),
+                         state='readonly').grid(row=0, column=0, columnspan=2, sticky=EW, padx=5, pady=5)
+
+            ttk.Label(method_frame, text="Окно:").grid(row=1, column=0, sticky=W, padx=5)
+            window_var = ttk.StringVar(value='hann')
+            ttk.Combobox(method_frame, textvariable=window_var, values=list(TKE_SpectrumCalculator.WINDOWS),
+                         state='readonly', width=10).grid(row=1, column=1, sticky=W, padx=5)
+
+            ttk.Label(method_frame, text="Длина сегмента (пусто — N/8):").grid(row=2, column=0, sticky=W, padx=5)
+            segment_entry = ttk.Entry(method_frame, width=10)
+            segment_entry.grid(row=2, column=1, sticky=W, padx=5)
+
+            ttk.Label(method_frame, text="Перекрытие (0–0.9):").grid(row=3, column=0, sticky=W, padx=5)
+            overlap_entry = ttk.Entry(method_frame, width=10)
+            overlap_entry.insert(0, '0.5')
+            overlap_entry.grid(row=3, column=1, sticky=W, padx=5)
+
+            ttk.Label(method_frame, text="Неравномерная ось:").grid(row=4, column=0, sticky=W, padx=5)
+            nonuniform_methods = {'Интерполяция на равномерную сетку': 'resample',
+                                  'Ломб–Скаргл': 'lombscargle'}
+            nonuniform_var = ttk.StringVar(value='Интерполяция на равномерную сетку')
+            ttk.Combobox(method_frame, textvariable=nonuniform_var, values=list(nonuniform_methods),
+                         state='readonly', width=34).grid(row=4, column=1, sticky=W, padx=5, pady=5)
+
             # Фрейм для кнопок
             button_frame = ttk.Frame(tke_window)
             button_frame.pack(fill=X, padx=10, pady=10)
@@ -128,7 +167,12 @@ class TkeTab(ttk.Frame):
                     tke_data = self.controller.tke_calculator.calculate_tke_spectrum(
                         self.controller.data_frame,
                         selected_axis,
-                        selected_functions
+                        selected_functions,
+                        method=methods[method_var.get()],
+                        segment_length=int(segment_entry.get()) if segment_entry.get().strip() else None,
+                        overlap=float(overlap_entry.get()),
+                        window=window_var.get(),
+                        nonuniform=nonuniform_methods[nonuniform_var.get()]
                     )
 
                     # Уведомление об успешном расчете
@@ -136,7 +180,11 @@ class TkeTab(ttk.Frame):
                     logger.info("Спектр ТКЭ успешно рассчитан")
 
                     # Объединение данных спектра ТКЭ с текущим DataFrame
-                    self.controller.data_frame = pd.concat([self.controller.data_frame, tke_data], axis=1)
+                    if isinstance(self.controller.data_frame, LazyFrame):
+                        self.controller.data_frame.add_columns(tke_data)
+                    else:
+                        self.controller.apply_data(pd.concat([self.controller.data_frame, tke_data], axis=1),
+                                                   "спектр ТКЭ")
 
                     # Обновление интерфейса или экспорт данных в графики (если это необходимо)
                     self.controller.update_tabs()
@@ -151,3 +199,163 @@ class TkeTab(ttk.Frame):
 
         except Exception as e:
             messagebox.showerror('Ошибка', f'Не удалось открыть окно расчета спектра ТКЭ: {str(e)}')
+
+    def calculate_autocorrelation(self):
+        """
+        Расчет автокорреляции R(r) по исходным полям пульсаций (FFT) и, по желанию, спектра ТКЭ по ней.
+        """
+        if self.controller.data_frame is None:
+            messagebox.showwarning('Предупреждение', 'Сначала загрузите данные')
+            return
+
+        columns = list(self.controller.data_frame.columns)
+        axis_columns = [col for col in columns if 'Centroid' in col or col in GridIndex.AXES]
+        if not axis_columns:
+            messagebox.showwarning('Предупреждение', 'В данных не найдены координатные колонки')
+            return
+
+        acf_window = ttk.Toplevel(self)
+        acf_window.title('Автокорреляция по полям')
+        acf_window.geometry('500x600')
+
+        axis_frame = ttk.LabelFrame(acf_window, text="Ось сдвига")
+        axis_frame.pack(fill=X, padx=10, pady=10)
+        axis_var = ttk.StringVar(value=axis_columns[0])
+        ttk.Combobox(axis_frame, textvariable=axis_var, values=axis_columns,
+                     state='readonly').pack(fill=X, padx=5, pady=5)
+
+        functions_frame = ttk.LabelFrame(acf_window, text="Поля пульсаций")
+        functions_frame.pack(fill=BOTH, expand=YES, padx=10, pady=10)
+
+        canvas = tk.Canvas(functions_frame)
+        scrollbar = ttk.Scrollbar(functions_frame, orient="vertical", command=canvas.yview)
+        scrollable_frame = ttk.Frame(canvas)
+        scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
+        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
+        canvas.configure(yscrollcommand=scrollbar.set)
+        canvas.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        function_vars = {}
+        for col in columns:
+            if col in axis_columns:
+                continue
+            var = tk.BooleanVar(value=False)
+            function_vars[col] = var
+            ttk.Checkbutton(scrollable_frame, text=col, variable=var).pack(anchor=W, padx=5, pady=2)
+
+        options_frame = ttk.LabelFrame(acf_window, text="Параметры")
+        options_frame.pack(fill=X, padx=10, pady=10)
+
+        normalize_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options_frame, text="Нормировать на дисперсию (R(0) = 1)",
+                        variable=normalize_var).grid(row=0, column=0, columnspan=2, sticky=W, padx=5, pady=2)
+
+        ttk.Label(options_frame, text="Наибольший сдвиг, точек (пусто — все):").grid(row=1, column=0, sticky=W, padx=5)
+        max_lag_entry = ttk.Entry(options_frame, width=10)
+        max_lag_entry.grid(row=1, column=1, sticky=W, padx=5)
+
+        spectrum_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options_frame, text="Сразу рассчитать спектр ТКЭ (периодограмма)",
+                        variable=spectrum_var).grid(row=2, column=0, columnspan=2, sticky=W, padx=5, pady=2)
+
+        def process_acf():
+            selected_axis = axis_var.get()
+            selected_functions = [col for col, var in function_vars.items() if var.get()]
+            if not selected_axis or not selected_functions:
+                messagebox.showwarning('Предупреждение', 'Выберите ось и хотя бы одно поле')
+                return
+
+            try:
+                data = self.controller.data_frame
+                if isinstance(data, LazyFrame):
+                    data = data.project([selected_axis] + selected_functions)
+                max_lag = int(max_lag_entry.get()) if max_lag_entry.get().strip() else None
+                if spectrum_var.get():
+                    acf_data, tke_data = self.controller.tke_calculator.calculate_tke_spectrum_from_fields(
+                        data, selected_axis, selected_functions, normalize=normalize_var.get(), max_lag=max_lag
+                    )
+                    result = pd.concat([acf_data, tke_data], axis=1)
+                else:
+                    result = self.controller.tke_calculator.calculate_autocorrelation(
+                        data, selected_axis, selected_functions, normalize=normalize_var.get(), max_lag=max_lag
+                    )
+
+                # Объединение результатов с текущим DataFrame
+                if isinstance(self.controller.data_frame, LazyFrame):
+                    self.controller.data_frame.add_columns(result)
+                else:
+                    self.controller.apply_data(pd.concat([self.controller.data_frame, result], axis=1),
+                                               "автокорреляция")
+                self.controller.update_tabs()
+                messagebox.showinfo('Успех', 'Автокорреляция рассчитана')
+                logger.info("Автокорреляция по полям успешно рассчитана")
+                acf_window.destroy()
+            except Exception as e:
+                messagebox.showerror('Ошибка', f'Не удалось рассчитать автокорреляцию: {str(e)}')
+                logger.error(f'Ошибка при расчете автокорреляции: {str(e)}')
+
+        ttk.Button(acf_window, text="Рассчитать", command=process_acf).pack(pady=10)
+
+    def calculate_3d_spectrum(self):
+        """
+        Расчет трехмерного спектра энергии E(|k|) по полям скорости на структурированной сетке.
+        """
+        if self.controller.data_frame is None:
+            messagebox.showwarning('Предупреждение', 'Сначала загрузите данные')
+            return
+
+        columns = list(self.controller.data_frame.columns)
+        coordinate_columns = list(GridIndex.AXES)
+        if not all(col in columns for col in coordinate_columns):
+            messagebox.showwarning('Предупреждение', 'Для трехмерного спектра нужны колонки X/Y/Z (m)')
+            return
+        value_columns = [col for col in columns if col not in coordinate_columns]
+
+        spectrum_window = ttk.Toplevel(self)
+        spectrum_window.title('Трехмерный спектр E(k)')
+
+        components_frame = ttk.LabelFrame(spectrum_window, text="Компоненты скорости")
+        components_frame.pack(fill=X, padx=10, pady=10)
+
+        component_vars = []
+        for row, name in enumerate(('U', 'V', 'W')):
+            ttk.Label(components_frame, text=f"{name}:").grid(row=row, column=0, sticky=W, padx=5, pady=2)
+            var = ttk.StringVar(value=next((col for col in value_columns if col.upper().startswith(name)), ''))
+            ttk.Combobox(components_frame, textvariable=var, values=[''] + value_columns,
+                         state='readonly', width=30).grid(row=row, column=1, padx=5, pady=2)
+            component_vars.append(var)
+
+        ttk.Label(spectrum_window, text="Кинематическая вязкость ν (м²/с):").pack(anchor=W, padx=10)
+        viscosity_entry = ttk.Entry(spectrum_window)
+        viscosity_entry.insert(0, '1.5e-5')
+        viscosity_entry.pack(fill=X, padx=10, pady=5)
+
+        def process_3d():
+            velocity_columns = [var.get() for var in component_vars if var.get()]
+            if not velocity_columns:
+                messagebox.showwarning('Предупреждение', 'Выберите хотя бы одну компоненту скорости')
+                return
+            try:
+                data = self.controller.data_frame
+                if isinstance(data, LazyFrame):
+                    data = data.project(coordinate_columns + velocity_columns)
+                spectrum = self.controller.tke_calculator.calculate_3d_spectrum(
+                    data, velocity_columns, viscosity=float(viscosity_entry.get())
+                )
+                spectrum = spectrum[['k', 'E', 'D']].add_suffix('_3D')
+
+                # Объединение спектра с текущим DataFrame (как для одномерного спектра)
+                if isinstance(self.controller.data_frame, LazyFrame):
+                    self.controller.data_frame.add_columns(spectrum)
+                else:
+                    self.controller.apply_data(pd.concat([self.controller.data_frame, spectrum], axis=1),
+                                               "трехмерный спектр")
+                self.controller.update_tabs()
+                messagebox.showinfo('Успех', 'Трехмерный спектр рассчитан (колонки k_3D, E_3D, D_3D)')
+                spectrum_window.destroy()
+            except Exception as e:
+                messagebox.showerror('Ошибка', f'Не удалось рассчитать трехмерный спектр: {str(e)}')
+                logger.error(f'Ошибка при расчете трехмерного спектра: {str(e)}')
+
+        ttk.Button(spectrum_window, text="Рассчитать", command=process_3d).pack(pady=10)
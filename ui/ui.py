@@ -1,3 +1,7 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import ttkbootstrap as ttk
@@ -7,9 +11,13 @@ import pandas as pd
 from logger import logger
 from ui.data_tab import DataTab
 from ui.plot_tab import PlotTab
-from data_loader import DataLoader
+from data_loader import DataLoader, LoadCancelledError
+from lazy_frame import LazyFrame
+from merge_tables import concat_tables, default_suffixes
 from ui.tke_tab import TkeTab
 from data_processor import DataProcessor
+from processing_pipeline import ProcessingPipeline
+from data_history import DataHistory
 from tke_spectrum_calculator import TKE_SpectrumCalculator
 from plotter import Plotter
 import matplotlib.pyplot as plt
@@ -26,10 +34,16 @@ class DataAnalyzer(TkinterDnD.Tk):
         self.geometry('1140x1140')
         self.style = ttk.Style("flatly")
         self.data_frame = None
+        # Наборы последней загрузки: {имя: DataFrame}. Новая загрузка заменяет их,
+        # чтобы прежние (возможно, многогигабайтные) таблицы освобождались
+        self.datasets = {}
+        self.active_dataset = None  # Имя активного набора в self.datasets
 
         # Инициализация вспомогательных классов
         self.data_loader = DataLoader()
         self.data_processor = DataProcessor()
+        self.pipeline = ProcessingPipeline()  # Запись операций вкладки "Данные" для повтора
+        self.history = DataHistory()  # Отмена и повтор операций над текущей таблицей
         self.tke_calculator = TKE_SpectrumCalculator()
         self.plotter = Plotter(controller=self)
 
@@ -86,6 +100,15 @@ class DataAnalyzer(TkinterDnD.Tk):
         self.curves = []
         self.legend_position_var = ttk.StringVar(value='upper right')
 
+        # Для CSV читать только заголовки, данные колонок — по требованию.
+        # По умолчанию выключено: обычная загрузка идет по частям, с кэшем, прогрессом и отменой
+        self.lazy_load_var = tk.BooleanVar(value=False)
+
+        # Состояние фоновой загрузки
+        self.load_queue = queue.Queue()
+        self.load_thread = None
+        self.load_cancel_event = threading.Event()
+
     def create_widgets(self):
         """Создание вкладок и статусной строки"""
         # Создание вкладок
@@ -101,8 +124,17 @@ class DataAnalyzer(TkinterDnD.Tk):
 
         notebook_frame.pack(fill=tk.BOTH, expand=tk.YES, padx=10, pady=10)
         # Создание строки состояния
-        self.status_bar = ttk.Label(self, text="Готов к работе", relief=tk.SUNKEN, anchor=tk.W)
-        self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        status_frame = ttk.Frame(self)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        self.status_bar = ttk.Label(status_frame, text="Готов к работе", relief=tk.SUNKEN, anchor=tk.W)
+        self.status_bar.pack(side=tk.LEFT, fill=tk.X, expand=tk.YES)
+
+        # Прогресс и отмена фоновой загрузки
+        self.cancel_load_button = ttk.Button(status_frame, text="Отмена", command=self.cancel_load,
+                                             state=tk.DISABLED)
+        self.cancel_load_button.pack(side=tk.RIGHT, padx=5)
+        self.load_progress = ttk.Progressbar(status_frame, maximum=100, length=200)
+        self.load_progress.pack(side=tk.RIGHT, padx=5)
 
         # Вкладка "Автокорреляция и Спектр ТКЭ"
         self.tke_tab = TkeTab(notebook_frame, controller=self)
@@ -134,9 +166,19 @@ class DataAnalyzer(TkinterDnD.Tk):
         
         file_menu.add_command(label="Открыть CSV", command=self.load_csv)
         file_menu.add_command(label="Открыть XLSX", command=self.load_xlsx)
+        file_menu.add_checkbutton(label="Загружать колонки CSV по требованию", variable=self.lazy_load_var)
         file_menu.add_separator()
         file_menu.add_command(label="Выход", command=self.quit)
 
+        # Меню "Правка"
+        edit_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Правка", menu=edit_menu)
+
+        edit_menu.add_command(label="Отменить", command=self.undo, accelerator="Ctrl+Z")
+        edit_menu.add_command(label="Повторить", command=self.redo, accelerator="Ctrl+Y")
+        self.bind_all('<Control-z>', lambda e: self.undo())
+        self.bind_all('<Control-y>', lambda e: self.redo())
+
         # Меню "Тема"
         theme_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Тема", menu=theme_menu)
@@ -157,50 +199,353 @@ class DataAnalyzer(TkinterDnD.Tk):
         # Открытие диалогового окна для выбора файла
         file_path = filedialog.askopenfilename(filetypes=[('CSV files', '*.csv')])
         if file_path:  # Проверяем, что пользователь выбрал файл
-            try:
-                # Загружаем данные с помощью data_loader
-                self.data_frame = self.data_loader.load_csv(file_path)
-
-                
-                # Проверяем, что данные успешно загружены
-                if self.data_frame is None or self.data_frame.empty:
-                    logger.warning("Загруженный файл пуст или не содержит данных")
-                    self.show_error("Файл пуст или не содержит данных")
-                    return
-                
-                # Логирование первых строк для отладки
-                logger.info(f"Загруженные данные:\n{self.data_frame.head()}")
-                
-                # Обновляем вкладки интерфейса
-                self.update_tabs()
-                self.data_tab.update_preview()
-            except pd.errors.EmptyDataError:
-                logger.error("Файл пуст или имеет неправильный формат")
-                self.show_error("Файл пуст или имеет неправильный формат")
-            except pd.errors.ParserError as e:
-                logger.error(f"Ошибка парсинга CSV: {str(e)}")
-                self.show_error(f"Ошибка парсинга CSV: {str(e)}")
-            except Exception as e:
-                logger.error(f"Не удалось загрузить CSV: {str(e)}")
-                self.show_error(f"Ошибка: {str(e)}")
+            self.load_data(file_path, 'csv')
             
     def load_xlsx(self):
         """Загрузка данных из XLSX файла"""
         file_path = filedialog.askopenfilename(filetypes=[('Excel files', '*.xlsx')])
         if file_path:
-            self.load_data(file_path, 'xlsx')
+            self.open_xlsx_options(file_path)
+
+    def open_xlsx_options(self, file_path):
+        """Окно выбора листа и колонок XLSX (по заголовкам, без чтения данных)"""
+        try:
+            sheets = self.data_loader.scan_xlsx(file_path)
+        except Exception as e:
+            self.show_error(str(e))
+            return
+        if not sheets:
+            self.show_error("В книге нет листов")
+            return
+
+        window = ttk.Toplevel(self)
+        window.title('Выбор листа и колонок')
+
+        ttk.Label(window, text="Лист:").pack(anchor=W, padx=10, pady=5)
+        sheet_var = ttk.StringVar(value=next(iter(sheets)))
+        sheet_menu = ttk.Combobox(window, textvariable=sheet_var, values=list(sheets), state='readonly')
+        sheet_menu.pack(fill=X, padx=10)
+
+        columns_frame = ttk.LabelFrame(window, text="Колонки")
+        columns_frame.pack(fill=BOTH, expand=YES, padx=10, pady=10)
+        column_vars = {}
+
+        def show_columns(event=None):
+            for widget in columns_frame.winfo_children():
+                widget.destroy()
+            column_vars.clear()
+            for col in sheets[sheet_var.get()]:
+                var = tk.BooleanVar(value=True)
+                ttk.Checkbutton(columns_frame, text=col, variable=var).pack(anchor=W)
+                column_vars[col] = var
+
+        def apply_selection():
+            columns = [col for col, var in column_vars.items() if var.get()]
+            if not columns:
+                messagebox.showwarning('Предупреждение', 'Выберите хотя бы одну колонку')
+                return
+            window.destroy()
+            self.load_data(file_path, 'xlsx', sheet_name=sheet_var.get(), columns=columns)
+
+        sheet_menu.bind('<<ComboboxSelected>>', show_columns)
+        show_columns()
+        ttk.Button(window, text="Загрузить", command=apply_selection).pack(pady=10)
+
+    def load_data(self, file_path, file_type, **options):
+        """Запуск фоновой загрузки данных; интерфейс обновляется по ее завершении"""
+        if self.load_thread is not None and self.load_thread.is_alive():
+            messagebox.showwarning('Предупреждение', 'Дождитесь окончания текущей загрузки или отмените ее')
+            return
+
+        if file_type == 'csv':
+            options.setdefault('lazy', self.lazy_load_var.get())
+
+        self.load_cancel_event.clear()
+        self.load_progress['value'] = 0
+        self.cancel_load_button.config(state=tk.NORMAL)
+        self.status_bar.config(text=f"Загрузка: {file_path}")
+        logger.info(f"Начата фоновая загрузка файла: {file_path}")
+
+        self.load_thread = threading.Thread(
+            target=self._load_worker, args=(file_path, file_type, options), daemon=True
+        )
+        self.load_thread.start()
+        self.after(100, self._poll_load_queue)
 
-    def load_data(self, file_path, file_type):
-        """Загрузка данных и обновление интерфейса"""
+    def _report_load_progress(self, fraction):
+        """progress_callback фоновых задач: передает долю в очередь и прерывает задачу при отмене"""
+        if self.load_cancel_event.is_set():
+            raise LoadCancelledError("Загрузка отменена")
+        self.load_queue.put(('progress', fraction))
+
+    def _load_worker(self, file_path, file_type, options):
+        """Разбор файла в рабочем потоке. С Tk здесь работать нельзя — только через очередь"""
         try:
-            self.data_frame = self.data_loader.load_data(file_path, file_type)
-            self.update_tabs()
-            self.status_bar.config(text=f"Данные загружены: {file_path}")
-            messagebox.showinfo('Успех', f'Файл загружен: {file_path}')
-            logger.info(f"Данные успешно загружены из файла: {file_path}")
+            data_frame = self.data_loader.load_data(
+                file_path, file_type, progress_callback=self._report_load_progress, **options
+            )
+            if self.load_cancel_event.is_set():
+                raise LoadCancelledError("Загрузка отменена")
+            self.load_queue.put(('done', (file_path, data_frame)))
+        except LoadCancelledError:
+            self.load_queue.put(('cancelled', file_path))
         except Exception as e:
-            messagebox.showerror('Ошибка', f'Не удалось загрузить файл: {str(e)}')
-            logger.error(f"Ошибка при загрузке данных из файла {file_path}: {str(e)}")
+            self.load_queue.put(('error', (file_path, e)))
+
+    def _poll_load_queue(self):
+        """Опрос очереди фоновой загрузки через after()"""
+        try:
+            while True:
+                kind, payload = self.load_queue.get_nowait()
+                if kind == 'progress':
+                    self.load_progress['value'] = payload * 100
+                    self.status_bar.config(text=f"Загрузка: {payload:.0%}")
+                else:
+                    self._finish_load(kind, payload)
+                    return
+        except queue.Empty:
+            pass
+        self.after(100, self._poll_load_queue)
+
+    def _finish_load(self, kind, payload):
+        """Применение результата загрузки в главном потоке"""
+        self.cancel_load_button.config(state=tk.DISABLED)
+        self.load_progress['value'] = 0
+
+        if kind == 'cancelled':
+            self.status_bar.config(text="Загрузка отменена")
+            logger.info(f"Загрузка файла отменена: {payload}")
+            return
+
+        if kind == 'error':
+            file_path, e = payload
+            self.status_bar.config(text="Ошибка загрузки")
+            if isinstance(e, pd.errors.EmptyDataError):
+                self.show_error("Файл пуст или имеет неправильный формат")
+            elif isinstance(e, pd.errors.ParserError):
+                self.show_error(f"Ошибка парсинга CSV: {str(e)}")
+            else:
+                self.show_error(f"Не удалось загрузить файл {file_path}: {str(e)}")
+            return
+
+        if kind == 'batch_done':
+            self._finish_batch(*payload)
+            return
+
+        if kind == 'materialized':
+            lazy_frame, data_frame, then = payload
+            if self.data_frame is lazy_frame:
+                self._set_data(data_frame)
+            self.status_bar.config(text="Все колонки загружены")
+            logger.info("Ленивая таблица полностью загружена в фоне")
+            then()
+            return
+
+        file_path, data_frame = payload
+        if data_frame is None or data_frame.empty:
+            logger.warning("Загруженный файл пуст или не содержит данных")
+            self.status_bar.config(text="Ошибка загрузки")
+            self.show_error("Файл пуст или не содержит данных")
+            return
+
+        # Подмена данных только после полной загрузки; прежние наборы освобождаются
+        self.datasets.clear()
+        self.active_dataset = self.register_dataset(file_path, data_frame)
+        self.data_frame = data_frame
+        self.history.clear()
+        logger.info(f"Загруженные данные:\n{self.data_frame.head()}")
+        self.update_tabs()
+        self.data_tab.update_preview()
+        self.status_bar.config(text=f"Данные загружены: {file_path}")
+        logger.info(f"Данные успешно загружены из файла: {file_path}")
+
+    def load_batch(self, file_paths):
+        """Параллельная загрузка нескольких файлов в фоне"""
+        if self.load_thread is not None and self.load_thread.is_alive():
+            messagebox.showwarning('Предупреждение', 'Дождитесь окончания текущей загрузки или отмените ее')
+            return
+
+        self.load_cancel_event.clear()
+        self.load_progress['value'] = 0
+        self.cancel_load_button.config(state=tk.NORMAL)
+        self.status_bar.config(text=f"Загрузка файлов: {len(file_paths)}")
+        logger.info(f"Начата пакетная загрузка файлов: {file_paths}")
+
+        self.load_thread = threading.Thread(target=self._batch_worker, args=(file_paths,), daemon=True)
+        self.load_thread.start()
+        self.after(100, self._poll_load_queue)
+
+    def _batch_worker(self, file_paths):
+        """Разбор очереди файлов пулом потоков (парсеры pandas/pyarrow отпускают GIL)"""
+        def check_cancel(fraction):
+            if self.load_cancel_event.is_set():
+                raise LoadCancelledError("Загрузка отменена")
+
+        def load_one(path):
+            check_cancel(0)
+            file_type = 'xlsx' if path.endswith('.xlsx') else 'csv'
+            return self.data_loader.load_data(path, file_type, progress_callback=check_cancel)
+
+        results = {}
+        errors = []
+        with ThreadPoolExecutor(max_workers=min(len(file_paths), os.cpu_count() or 1)) as executor:
+            futures = {executor.submit(load_one, path): path for path in file_paths}
+            for done, future in enumerate(as_completed(futures), start=1):
+                path = futures[future]
+                try:
+                    results[path] = future.result()
+                except LoadCancelledError:
+                    pass
+                except Exception as e:
+                    errors.append((path, str(e)))
+                self.load_queue.put(('progress', done / len(file_paths)))
+
+        if self.load_cancel_event.is_set():
+            self.load_queue.put(('cancelled', file_paths))
+            return
+        # Порядок наборов совпадает с порядком файлов, а не с порядком завершения
+        ordered = [(path, results[path]) for path in file_paths if path in results]
+        self.load_queue.put(('batch_done', (ordered, errors)))
+
+    def _finish_batch(self, loaded, errors):
+        """Регистрация наборов после пакетной загрузки и, по желанию, их объединение"""
+        for path, error in errors:
+            logger.error(f"Ошибка при загрузке файла {path}: {error}")
+        if errors:
+            self.show_error("Не удалось загрузить:\n" + "\n".join(f"{path}: {error}" for path, error in errors))
+        if not loaded:
+            self.status_bar.config(text="Ошибка загрузки")
+            return
+
+        # Пакет заменяет наборы предыдущей загрузки
+        self.datasets.clear()
+        names = [self.register_dataset(path, data_frame) for path, data_frame in loaded]
+        active = names[0]
+
+        if len(loaded) > 1 and messagebox.askyesno('Объединение', f'Объединить загруженные таблицы ({len(loaded)})?'):
+            try:
+                frames = [data_frame for _, data_frame in loaded]
+                merged = concat_tables(frames, default_suffixes(len(frames)))
+                active = self.register_dataset(f"Объединение ({len(frames)})", merged)
+            except Exception as e:
+                self.show_error(f"Не удалось объединить таблицы: {str(e)}")
+
+        self.select_dataset(active)
+        self.status_bar.config(text=f"Загружено файлов: {len(loaded)}")
+        logger.info(f"Пакетная загрузка завершена: {names}")
+
+    def register_dataset(self, source, data_frame):
+        """Сохраняет набор данных под уникальным именем и возвращает это имя"""
+        base_name = os.path.basename(source)
+        name = base_name
+        index = 2
+        while name in self.datasets and self.datasets[name] is not data_frame:
+            name = f"{base_name} ({index})"
+            index += 1
+        self.datasets[name] = data_frame
+        return name
+
+    def select_dataset(self, name):
+        """Делает набор данных активным"""
+        self.data_frame = self.datasets[name]
+        self.active_dataset = name
+        self.history.clear()
+        self.update_tabs()
+        self.data_tab.update_preview()
+        logger.info(f"Активный набор данных: {name}")
+
+    def cancel_load(self):
+        """Отмена фоновой загрузки"""
+        if self.load_thread is not None and self.load_thread.is_alive():
+            self.load_cancel_event.set()
+            self.status_bar.config(text="Отмена загрузки...")
+
+    def materialize_in_background(self, then):
+        """
+        Полная загрузка ленивой таблицы в фоновом потоке (прогресс и отмена как при загрузке файла).
+
+        :param then: Вызывается в главном потоке, когда таблица загружена.
+        :return: True, если загрузка запущена (операцию выполнит then), False — таблица уже в памяти.
+        """
+        if not isinstance(self.data_frame, LazyFrame):
+            return False
+        if self.load_thread is not None and self.load_thread.is_alive():
+            messagebox.showwarning('Предупреждение', 'Дождитесь окончания текущей загрузки или отмените ее')
+            return True
+
+        self.load_cancel_event.clear()
+        self.load_progress['value'] = 0
+        self.cancel_load_button.config(state=tk.NORMAL)
+        self.status_bar.config(text="Загрузка всех колонок...")
+        self.load_thread = threading.Thread(
+            target=self._materialize_worker, args=(self.data_frame, then), daemon=True
+        )
+        self.load_thread.start()
+        self.after(100, self._poll_load_queue)
+        return True
+
+    def _materialize_worker(self, lazy_frame, then):
+        """Полное чтение файла ленивой таблицы в рабочем потоке"""
+        try:
+            data_frame = lazy_frame.materialize(progress_callback=self._report_load_progress)
+            if self.load_cancel_event.is_set():
+                raise LoadCancelledError("Загрузка отменена")
+            self.load_queue.put(('materialized', (lazy_frame, data_frame, then)))
+        except LoadCancelledError:
+            self.load_queue.put(('cancelled', lazy_frame.file_path))
+        except Exception as e:
+            self.load_queue.put(('error', (lazy_frame.file_path, e)))
+
+    def apply_data(self, data_frame, description):
+        """Заменяет текущую таблицу результатом операции, запоминая изменение для отмены"""
+        self.history.record(self.data_frame, data_frame, description,
+                            state={'pipeline_length': len(self.pipeline)})
+        self._set_data(data_frame)
+
+    def _set_data(self, data_frame):
+        """Заменяет текущую таблицу и запись активного набора (результаты обработки не теряются при переключении)"""
+        self.data_frame = data_frame
+        if self.active_dataset in self.datasets:
+            self.datasets[self.active_dataset] = data_frame
+
+    def set_pipeline(self, pipeline):
+        """
+        Заменяет план обработки.
+
+        Записи истории хранят длину прежнего плана; без пересчета отмена удалила бы шаги
+        нового плана, а повтор дописал бы в него шаги старого.
+        """
+        self.pipeline = pipeline
+        self.history.update_state(pipeline_length=len(pipeline), steps=[])
+
+    def undo(self):
+        """Отмена последней операции над данными"""
+        if not self.history.can_undo:
+            self.status_bar.config(text="Нечего отменять")
+            return
+        data_frame, entry = self.history.undo(self.data_frame)
+        self._set_data(data_frame)
+        # Шаги плана, записанные этой операцией, убираются до повтора
+        length = entry.state['pipeline_length']
+        entry.state['steps'] = self.pipeline.steps[length:]
+        del self.pipeline.steps[length:]
+        self._refresh_after_history(f"Отменено: {entry.description}")
+
+    def redo(self):
+        """Повтор отмененной операции"""
+        if not self.history.can_redo:
+            self.status_bar.config(text="Нечего повторять")
+            return
+        data_frame, entry = self.history.redo(self.data_frame)
+        self._set_data(data_frame)
+        self.pipeline.steps.extend(entry.state.pop('steps', []))
+        self._refresh_after_history(f"Повторено: {entry.description}")
+
+    def _refresh_after_history(self, message):
+        self.update_tabs()
+        self.data_tab.update_preview()
+        self.update_plot_tab()
+        self.status_bar.config(text=message)
 
     def update_tabs(self):
         """Обновление вкладок после загрузки данных"""
@@ -208,6 +553,8 @@ class DataAnalyzer(TkinterDnD.Tk):
             self.data_tab.update_data_info()
         if hasattr(self.plot_tab, 'update_column_menus'):
             self.plot_tab.update_column_menus()
+        if hasattr(self.data_tab, 'update_dataset_menu'):
+            self.data_tab.update_dataset_menu()
 
     def toggle_theme(self):
         """Переключение темы интерфейса"""
@@ -271,19 +618,42 @@ class DataAnalyzer(TkinterDnD.Tk):
         self.dnd_bind('<<Drop>>', self.drop_file)
 
     def drop_file(self, event):
-        """Обработка события перетаскивания файла"""
-        file_path = event.data.strip()
-        if file_path.endswith('.csv'):
-            self.load_data(file_path, 'csv')
-        elif file_path.endswith('.xlsx'):
-            self.load_data(file_path, 'xlsx')
-        else:
+        """Обработка перетаскивания файлов и папок"""
+        dropped = self.tk.splitlist(event.data)
+        file_paths = self.expand_dropped_paths(dropped)
+        if not file_paths:
             messagebox.showerror('Ошибка', 'Неподдерживаемый формат файла')
-            logger.error(f"Неподдерживаемый формат файла: {file_path}")
+            logger.error(f"Неподдерживаемый формат файла: {event.data}")
+            return
+
+        if len(file_paths) > 1:
+            self.load_batch(file_paths)
+        elif file_paths[0].endswith('.csv'):
+            self.load_data(file_paths[0], 'csv')
+        else:
+            self.open_xlsx_options(file_paths[0])
+
+    def expand_dropped_paths(self, paths):
+        """Раскрывает папки и отбирает поддерживаемые файлы"""
+        file_paths = []
+        for path in paths:
+            if os.path.isdir(path):
+                file_paths.extend(
+                    os.path.join(path, name) for name in sorted(os.listdir(path))
+                    if name.endswith(('.csv', '.xlsx'))
+                )
+            elif path.endswith(('.csv', '.xlsx')):
+                file_paths.append(path)
+            else:
+                logger.warning(f"Пропущен файл неподдерживаемого формата: {path}")
+        return file_paths
 
     def reset_data(self):
         """Сброс загруженных данных"""
         self.data_frame = None
+        self.datasets.clear()
+        self.active_dataset = None
+        self.history.clear()
         self.curves.clear()
         self.theory_curves.clear()
         self.update_tabs()
@@ -320,22 +690,28 @@ class DataAnalyzer(TkinterDnD.Tk):
             filetypes=[('CSV files', '*.csv'), ('Excel files', '*.xlsx'), ('All files', '*.*')]
         )
         if file_path:
-            try:
-                if file_path.endswith('.csv'):
-                    self.data_frame.to_csv(file_path, index=False)
-                elif file_path.endswith('.xlsx'):
-                    self.data_frame.to_excel(file_path, index=False)
-                else:
-                    # Если формат не указан, сохраняем как CSV
-                    if not file_path.endswith('.csv'):
-                        file_path += '.csv'
-                    self.data_frame.to_csv(file_path, index=False)
+            self._write_export(file_path)
 
-                messagebox.showinfo('Успех', f'Данные успешно экспортированы в файл:\n{file_path}')
-                logger.info(f"Данные успешно экспортированы в файл: {file_path}")
-            except Exception as e:
-                messagebox.showerror('Ошибка', f'Не удалось экспортировать данные: {str(e)}')
-                logger.error(f"Ошибка при экспорте данных: {str(e)}")
+    def _write_export(self, file_path):
+        """Запись текущей таблицы; ленивая таблица сначала загружается в фоне"""
+        if self.materialize_in_background(lambda: self._write_export(file_path)):
+            return
+        try:
+            if file_path.endswith('.csv'):
+                self.data_frame.to_csv(file_path, index=False)
+            elif file_path.endswith('.xlsx'):
+                self.data_frame.to_excel(file_path, index=False)
+            else:
+                # Если формат не указан, сохраняем как CSV
+                if not file_path.endswith('.csv'):
+                    file_path += '.csv'
+                self.data_frame.to_csv(file_path, index=False)
+
+            messagebox.showinfo('Успех', f'Данные успешно экспортированы в файл:\n{file_path}')
+            logger.info(f"Данные успешно экспортированы в файл: {file_path}")
+        except Exception as e:
+            messagebox.showerror('Ошибка', f'Не удалось экспортировать данные: {str(e)}')
+            logger.error(f"Ошибка при экспорте данных: {str(e)}")
     
     def add_curve(self):
         """Добавление новой кривой в список кривых"""